@@ -22,6 +22,7 @@ from texts_diversity.plot_config import PlotConfig
 from texts_diversity.metric import Metric
 from texts_diversity.texts_distances import TextsDistances
 from texts_diversity.algo import Algo
+from texts_diversity.entropy_ncd import HistogramEntropyNCD
 from texts_diversity.common_metrics import calc_mean_metric
 from texts_diversity.common_normalization import min_max_normalization
 from texts_diversity.plots_list import PlotsList
@@ -97,7 +98,13 @@ def parse_args():
 args = parse_args()
 
 lzma_algo = Algo("LZMANCD", LZMANCD().distance, color="royalblue")
-entropy_algo = Algo("EntropyNCD", EntropyNCD().distance, color="darkorange")
+entropy_ncd = HistogramEntropyNCD()
+entropy_algo = Algo(
+    "EntropyNCD",
+    entropy_ncd.distance,
+    color="darkorange",
+    batch_func=entropy_ncd.distances_to,
+)
 
 files_list = FilesList(dir=args.dir, shuffle=args.shuffle, max_files=args.max_files)
 
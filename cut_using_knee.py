@@ -15,6 +15,7 @@ def main() -> None:
         "--counter-report-file",
         type=str,
         required=True,
+        help="JSON counter, or an append-only binary counter log for .cntlog and .bin files",
     )
     parser.add_argument(
         "--knee-plot-path",
@@ -4,6 +4,7 @@ import os
 import random
 from typing import List, Tuple, Callable
 
+import numpy as np
 from scipy.stats import poisson
 from textdistance import EntropyNCD, LZMANCD
 import matplotlib.pyplot as plt
@@ -19,6 +20,7 @@ from texts_diversity.plot_config import PlotConfig
 from texts_diversity.metric import Metric
 from texts_diversity.texts_distances import TextsDistances
 from texts_diversity.algo import Algo
+from texts_diversity.entropy_ncd import HistogramEntropyNCD
 from texts_diversity.common_metrics import calc_mean_metric
 from texts_diversity.common_normalization import min_max_normalization
 from texts_diversity.plots_list import PlotsList
@@ -31,6 +33,7 @@ from src.TDSM.TDS_metric import TDSMetric
 from remove_percentage_compare_metric import RemovePercentageCompareFilter
 from remove_percentage_compare_plot import RemovePercentageComparePlot
 from src.TDSM.TDS_metric_plot import TDSMetricPlot
+from src.metrics.incremental_poisson_dist_metric import incremental_poisson_dist_metric
 from tests_runner import TestsRunner, TestsRunnerFolder
 
 
@@ -94,8 +97,7 @@ def calc_mean_sqrt_sum_squared_metric_from_minimax_center(
 
 
 def calc_poisson_distribution(distances: TextsDistances) -> float:
-    distance_values = distances.get_normalized_values()
-    distance_values.sort()
+    distance_values = np.sort(distances.get_normalized_values())
     values = []
     for i in range(len(distance_values)):
         value = 2 * distance_values[i] * poisson.pmf(i, len(distance_values))
@@ -152,7 +154,13 @@ def entropy_compress(text: str) -> bytes:
 entropy_algo_compress = CompressAlgo(name="Entropy", func=entropy_compress)
 
 lzma_algo = Algo("LZMANCD", LZMANCD().distance)
-entropy_algo = Algo("EntropyNCD", EntropyNCD().distance)
+entropy_ncd = HistogramEntropyNCD()
+entropy_algo = Algo(
+    "EntropyNCD",
+    entropy_ncd.distance,
+    color="darkorange",
+    batch_func=entropy_ncd.distances_to,
+)
 entropy_algo_x5 = Algo("EntropyNCD * 5", custom_entropy)
 poisson_metric = Metric("Poisson_dist", calc_poisson_distribution)
 poisson_mins_metric = Metric("Poisson_mins", calc_poisson_mins)
@@ -230,7 +238,7 @@ def main() -> None:
             Algo("Always 0", always_0),
             Algo("Always 1", always_1),
         ],
-        metric=lambda: Metric(name="Poisson_dist", calc=calc_poisson_distribution),
+        metric=incremental_poisson_dist_metric,
     )
 
     plot_configs = [
@@ -0,0 +1,114 @@
+import argparse
+import os
+import time
+from typing import Dict, List
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+from texts_diversity.files_list import FilesList
+from texts_diversity.algo import Algo
+from texts_diversity.cached_ncd import CachedLZMANCD
+from texts_diversity.executors import EXECUTOR_TYPES
+from texts_diversity.texts_distances import build_text_distances
+from texts_diversity.utils import save_plot_safely
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Compare executor types for building pairwise distances"
+    )
+    parser.add_argument(
+        "--dir",
+        type=str,
+        default="generated",
+        help="Directory containing input files (default: generated)",
+    )
+    parser.add_argument(
+        "--max-files",
+        type=int,
+        default=200,
+        help="Maximum number of files to process (default: 200)",
+    )
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=os.cpu_count(),
+    )
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=3,
+        help="Runs per executor type, the best time is reported (default: 3)",
+    )
+    parser.add_argument(
+        "--output-plot",
+        type=str,
+        default="distances_executor_benchmark.svg",
+        help="Path for output plot file (default: distances_executor_benchmark.svg)",
+    )
+    return parser.parse_args()
+
+
+def run_benchmark(
+    file_paths: List[str], max_workers: int, repeats: int
+) -> Dict[str, float]:
+    times = {}
+    reference_values = None
+
+    for executor in EXECUTOR_TYPES:
+        best_time = float("inf")
+        for _ in range(repeats):
+            # A fresh algo per run, so the compressed sizes cache starts empty
+            lzma_algo = Algo("LZMANCD", CachedLZMANCD().distance, color="royalblue")
+
+            start_time = time.time()
+            text_distances, _ = build_text_distances(
+                file_paths, lzma_algo, executor=executor, max_workers=max_workers
+            )
+            best_time = min(best_time, time.time() - start_time)
+
+        values = text_distances.get_normalized_values()
+        if reference_values is None:
+            reference_values = values
+        elif not np.array_equal(values, reference_values, equal_nan=True):
+            print(f"[{executor}] Values differ from the {EXECUTOR_TYPES[0]} run!")
+
+        times[executor] = best_time
+        print(
+            f"[{executor}] {len(file_paths)} files, {max_workers} workers: {best_time:.2f} seconds"
+        )
+
+    return times
+
+
+def draw(times: Dict[str, float], files_count: int, output_plot: str):
+    fig = plt.figure(figsize=(10, 6))
+    plt.bar(list(times.keys()), list(times.values()))
+    plt.xlabel("Executor")
+    plt.ylabel("Time (seconds)")
+    plt.title(f"Pairwise LZMANCD distances for {files_count} files")
+    plt.grid(True, axis="y", alpha=0.3)
+
+    plt.tight_layout()
+    save_plot_safely(fig, output_plot)
+
+
+args = parse_args()
+
+files_list = FilesList(files_dir=args.dir, shuffle=False, max_files=args.max_files)
+total_bytes = sum(os.path.getsize(path) for path in files_list.file_paths)
+print(
+    f"{len(files_list.file_paths)} files, mean size {total_bytes / max(1, len(files_list.file_paths)):.0f} bytes"
+)
+
+executor_times = run_benchmark(
+    file_paths=files_list.file_paths,
+    max_workers=args.max_workers,
+    repeats=args.repeats,
+)
+
+winner = min(executor_times, key=executor_times.get)
+print(f"Fastest executor: {winner}")
+
+draw(executor_times, len(files_list.file_paths), args.output_plot)
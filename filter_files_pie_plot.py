@@ -1,14 +1,20 @@
 import argparse
 import logging
 
-from textdistance import LZMANCD
-
-from src.sets_split.sets_split_mark import SetsSplitMark
+from src.sets_split.sets_split_mark import SHARED_DISTANCES_MODES, SetsSplitMark
 from src.sets_split.split_plots import SplitPlots
 from texts_diversity.files_list import FilesList
 from texts_diversity.algo import Algo
-from src.metrics.poisson_dist_metric import poisson_dist_metric
+from texts_diversity.cached_ncd import CachedLZMANCD
+from texts_diversity.distances_cache import DistancesCache
+from texts_diversity.executors import EXECUTOR_TYPES
+from texts_diversity.plot_renderer import PlotRenderer
+from src.metrics.incremental_poisson_dist_metric import (
+    incremental_poisson_dist_metric,
+)
 from src.knee.knee_cut import KneeCut
+from src.knee.marks_convergence import MarksConvergence
+from src.basic.mark_checkpoint import MarkCheckpoint
 
 
 def main() -> None:
@@ -31,6 +37,7 @@ def main() -> None:
         "--counter-report-file",
         type=str,
         required=True,
+        help="JSON counter, or an append-only binary counter log for .cntlog and .bin files",
     )
     parser.add_argument("--split-by", type=int, required=True)
     parser.add_argument(
@@ -48,6 +55,55 @@ def main() -> None:
         type=str,
         required=True,
     )
+    parser.add_argument(
+        "--executor",
+        type=str,
+        choices=EXECUTOR_TYPES,
+        default="process",
+        help="How subsets are processed in parallel",
+    )
+    parser.add_argument(
+        "--distances-cache",
+        type=str,
+        help="SQLite file with distances cached between runs",
+    )
+    parser.add_argument(
+        "--shared-distances",
+        type=str,
+        choices=SHARED_DISTANCES_MODES,
+        help="Keep one distance matrix of all files in shared memory for all rounds",
+    )
+    parser.add_argument(
+        "--balance-sets",
+        action="store_true",
+        help="Balance the random sets by estimated distances cost",
+    )
+    parser.add_argument(
+        "--stop-when-stable",
+        action="store_true",
+        help="Stop before --max-iter once the marks ranking and knee are stable",
+    )
+    parser.add_argument(
+        "--checkpoint-file",
+        type=str,
+        help="Save the run state after every round to this file",
+    )
+    parser.add_argument(
+        "--checkpoint-distances",
+        action="store_true",
+        help="Save the shared distances with the checkpoint (needs --shared-distances)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue the run saved in --checkpoint-file",
+    )
+    parser.add_argument(
+        "--render-interval",
+        type=float,
+        default=None,
+        help="Render the plot in a background process, at most once per this many seconds (default: after every round, in the loop)",
+    )
     args = parser.parse_args()
 
     directory = args.directory
@@ -55,23 +111,52 @@ def main() -> None:
 
     files_list = FilesList(files_dir=directory, shuffle=False, max_files=max_files)
 
-    lzma_algo = Algo("LZMANCD", LZMANCD().distance, color="royalblue")
+    lzma_algo = Algo("LZMANCD", CachedLZMANCD().distance, color="royalblue")
+    distances_cache = None
+    if args.distances_cache:
+        distances_cache = DistancesCache(args.distances_cache)
+        lzma_algo = distances_cache.wrap(lzma_algo)
 
     sets_split = SetsSplitMark(
         all_file_names=files_list.file_paths,
         split_by=args.split_by,
         algo=lzma_algo,
-        metric=poisson_dist_metric(),
+        metric=incremental_poisson_dist_metric(),
+        executor=args.executor,
+        shared_distances=args.shared_distances,
+        balance_sets=args.balance_sets,
     )
 
+    checkpoint = None
+    if args.checkpoint_file:
+        checkpoint = MarkCheckpoint(
+            args.checkpoint_file, save_distances=args.checkpoint_distances
+        )
+
+    renderer = None
+    if args.render_interval is not None:
+        renderer = PlotRenderer(interval=args.render_interval)
+
     split_files_plots = SplitPlots(
         sets_split=sets_split,
         output_file=args.output_file,
         max_iter=args.max_iter,
         counter_report_file=args.counter_report_file,
+        convergence=MarksConvergence() if args.stop_when_stable else None,
+        checkpoint=checkpoint,
+        renderer=renderer,
     )
 
-    split_files_plots.draw_all()
+    try:
+        split_files_plots.draw_all(resume=args.resume)
+    finally:
+        if renderer:
+            # Renders the last requested plot
+            renderer.close()
+    sets_split.close()
+
+    if distances_cache:
+        distances_cache.log_stats()
 
     KneeCut(
         knee_plot_path=args.knee_plot_path,
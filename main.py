@@ -1,12 +1,17 @@
 import argparse
+import os
 
-from textdistance import LZMANCD
-
-from src.sets_split.sets_split2 import SetsSplit2
+from src.sets_split.sets_split2 import FILTER_MODES, SetsSplit2
 from src.sets_split.split_filter_results import SplitFilterResults
 from texts_diversity.files_list import FilesList
 from texts_diversity.algo import Algo
-from src.metrics.poisson_dist_metric import poisson_dist_metric
+from texts_diversity.cached_ncd import CachedLZMANCD
+from texts_diversity.distances_cache import DistancesCache
+from texts_diversity.distances_oracle import DistancesOracle
+from texts_diversity.executors import EXECUTOR_TYPES
+from src.metrics.incremental_poisson_dist_metric import (
+    incremental_poisson_dist_metric,
+)
 import logging
 
 
@@ -27,6 +32,41 @@ def main() -> None:
         required=True,
     )
     parser.add_argument("--split-by", type=int, required=True)
+    parser.add_argument(
+        "--distances-cache",
+        type=str,
+        help="SQLite file with distances cached between runs",
+    )
+    parser.add_argument(
+        "--search-executor",
+        type=str,
+        choices=EXECUTOR_TYPES,
+        default="serial",
+        help="Evaluate removal percentages speculatively in parallel (default: serial)",
+    )
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help="Seed of the removal sampling, for reproducible filtering",
+    )
+    parser.add_argument(
+        "--filter-mode",
+        type=str,
+        choices=FILTER_MODES,
+        default="pct",
+        help="pct: random removals, loo: greedy by leave-one-out contribution",
+    )
+    parser.add_argument(
+        "--distances-oracle",
+        action="store_true",
+        help="Compute every pair once and reuse it in all filter rounds",
+    )
+    parser.add_argument(
+        "--balance-sets",
+        action="store_true",
+        help="Balance the random sets by estimated distances cost",
+    )
     args = parser.parse_args()
 
     directory = args.directory
@@ -34,18 +74,39 @@ def main() -> None:
 
     files_list = FilesList(files_dir=directory, shuffle=False, max_files=max_files)
 
-    lzma_algo = Algo("LZMANCD", LZMANCD().distance, color="royalblue")
+    lzma_algo = Algo("LZMANCD", CachedLZMANCD().distance, color="royalblue")
+    distances_cache = None
+    if args.distances_cache:
+        distances_cache = DistancesCache(args.distances_cache)
+        lzma_algo = distances_cache.wrap(lzma_algo)
+
+    distances_oracle = None
+    if args.distances_oracle:
+        distances_oracle = DistancesOracle(lzma_algo, files_list.file_paths)
 
     sets_split = SetsSplit2(
         all_file_names=files_list.file_paths,
         split_by=args.split_by,
         algo=lzma_algo,
-        metric=poisson_dist_metric(),
+        metric=incremental_poisson_dist_metric(),
+        seed=args.seed,
+        search_executor=args.search_executor,
+        max_workers=args.max_workers,
+        filter_mode=args.filter_mode,
+        oracle=distances_oracle,
+        balance_sets=args.balance_sets,
     )
 
     split_filter_results = SplitFilterResults(sets_split=sets_split)
 
-    split_filter_results.process(output_file_path=args.output_file)
+    with sets_split.worker_pool():
+        split_filter_results.process(output_file_path=args.output_file)
+
+    if distances_cache:
+        distances_cache.log_stats()
+    if distances_oracle:
+        distances_oracle.log_stats()
+        distances_oracle.close()
 
 
 if __name__ == "__main__":
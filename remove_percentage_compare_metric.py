@@ -83,10 +83,7 @@ class RemovePercentageCompareFilter:
     def text_distance_for_remaining_indices(
         self, text_distances: TextsDistances, remaining_text_indices: List[int]
     ) -> TextsDistances:
-        text_distances_copy = text_distances.copy()
-        texts_to_remove = self.original_texts_indices_set - set(remaining_text_indices)
-        text_distances_copy.remove_list(list(texts_to_remove))
-        return text_distances_copy
+        return text_distances.subset(remaining_text_indices)
 
     def metric_value_for_remaining_texts(
         self, remaining_text_indices: List[int]
@@ -117,7 +114,7 @@ class RemovePercentageCompareFilter:
             return text_indices, True, current_value
 
         for attempt in range(self.max_tries):
-            indices_to_remove = random.sample(text_indices, num_to_remove)
+            indices_to_remove = set(random.sample(text_indices, num_to_remove))
             remaining_indices = [
                 idx for idx in text_indices if idx not in indices_to_remove
             ]
@@ -5,6 +5,7 @@ import os
 import random
 from typing import List, Tuple, Callable
 
+import numpy as np
 from scipy.stats import poisson
 from textdistance import EntropyNCD, LZMANCD
 import matplotlib.pyplot as plt
@@ -20,6 +21,7 @@ from texts_diversity.plot_config import PlotConfig
 from texts_diversity.metric import Metric
 from texts_diversity.texts_distances import TextsDistances
 from texts_diversity.algo import Algo
+from texts_diversity.entropy_ncd import HistogramEntropyNCD
 from texts_diversity.common_metrics import calc_mean_metric
 from texts_diversity.common_normalization import min_max_normalization
 from texts_diversity.plots_list import PlotsList
@@ -34,7 +36,9 @@ from remove_percentage_compare_plot import RemovePercentageComparePlot
 from src.TDSM.TDS_metric_plot import TDSMetricPlot
 from tests_runner import TestsRunner, TestsRunnerFolder
 from texts_diversity.utils import save_plot_safely
+from texts_diversity.plot_renderer import PlotRenderer
 from src.pct_filter.filter_result import FilterResult
+from src.metrics.incremental_poisson_dist_metric import incremental_poisson_dist_metric
 
 
 # def calc_novelty_metric(distances: Distances) -> float:
@@ -97,8 +101,7 @@ def calc_mean_sqrt_sum_squared_metric_from_minimax_center(
 
 
 def calc_poisson_distribution(distances: TextsDistances) -> float:
-    distance_values = distances.get_normalized_values()
-    distance_values.sort()
+    distance_values = np.sort(distances.get_normalized_values())
     values = []
     for i in range(len(distance_values)):
         value = 2 * distance_values[i] * poisson.pmf(i, len(distance_values))
@@ -157,14 +160,21 @@ entropy_algo_compress = CompressAlgo(
 )
 
 lzma_algo = Algo("LZMANCD", LZMANCD().distance, color="royalblue")
-entropy_algo = Algo("EntropyNCD", EntropyNCD().distance, color="darkorange")
+entropy_ncd = HistogramEntropyNCD()
+entropy_algo = Algo(
+    "EntropyNCD",
+    entropy_ncd.distance,
+    color="darkorange",
+    batch_func=entropy_ncd.distances_to,
+)
 entropy_algo_x5 = Algo("EntropyNCD * 5", custom_entropy, color="chocolate")
 poisson_metric = Metric("Poisson_dist", calc_poisson_distribution)
 poisson_mins_metric = Metric("Poisson_mins", calc_poisson_mins)
 
 
 def poisson_dist_metric():
-    return Metric(name="Poisson_dist", calc=calc_poisson_distribution)
+    # Updates the growth curve from the new distance rows
+    return incremental_poisson_dist_metric()
 
 
 def main() -> None:
@@ -211,6 +221,12 @@ def main() -> None:
         required=True,
         help="Report pattern for filter results",
     )
+    parser.add_argument(
+        "--render-interval",
+        type=float,
+        default=None,
+        help="Render the plot in a background process, at most once per this many seconds (default: after every file, in the loop)",
+    )
     args = parser.parse_args()
 
     directory = args.directory
@@ -264,15 +280,27 @@ def main() -> None:
         errors_report_file_path=errors_report_file_path,
     )
 
-    TextsDiversity(
-        min_files_for_analysis=10,
-        files_list=files_list,
-        plots_list=PlotsList(
-            configs=plot_configs,
-            output_file=output_file,
-            fig=fig,
-        ),
-    ).draw_plots()
+    renderer = None
+    if args.render_interval is not None:
+        renderer = PlotRenderer(interval=args.render_interval)
+
+    try:
+        TextsDiversity(
+            min_files_for_analysis=10,
+            files_list=files_list,
+            plots_list=PlotsList(
+                configs=plot_configs,
+                output_file=output_file,
+                fig=fig,
+                renderer=renderer,
+            ),
+        ).draw_plots()
+    finally:
+        if renderer:
+            renderer.close()
+    if renderer:
+        # The boxplot below is added to this process's copy of the figure
+        renderer.render_here(output_file)
 
     pct_filters: List[RemovePercentageCompareFilter] = []
     compare_calc_infos_list = list(reversed(calc_infos_list))
@@ -1,24 +1,82 @@
+import os
 import time
-from typing import List
+from concurrent.futures import Executor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
 
 from texts_diversity.algo import CompressAlgo
+from texts_diversity.executors import make_executor
 from texts_diversity.iterative_metric import (
     IterativeMetric,
     IterativeMetricCalculationResult,
 )
 
 
+def _leave_out_rows_in_worker(
+    algo: CompressAlgo, texts: List[str], rows: List[int]
+) -> List[Tuple[int, int, List[int]]]:
+    """
+    For every i in `rows`: i, C(X\\{x_i}) and C(X\\{x_i, x_j}) for all
+    j > i.
+    """
+    results = []
+    for i in rows:
+        texts_without_i = texts[:i] + texts[i + 1 :]
+        c_x_removed = len(algo.func("".join(texts_without_i)))
+        c_xy_removed = []
+        for j in range(i, len(texts_without_i)):
+            texts_without_xy = texts_without_i[:j] + texts_without_i[j + 1 :]
+            c_xy_removed.append(len(algo.func("".join(texts_without_xy))))
+        results.append((i, c_x_removed, c_xy_removed))
+    return results
+
+
 class TDSMetric(IterativeMetric):
-    def __init__(self, algo: CompressAlgo):
+    """
+    Compressed sizes of single texts are cached across calls, they do not
+    change while texts are removed. calc() compresses every leave-two-out
+    concatenation once (NCD1 of each subset would compress it twice), on
+    `executor` with `max_workers` workers. The pool is started by the
+    first calc() and kept for the following ones, close() stops it.
+    """
+
+    def __init__(
+        self,
+        algo: CompressAlgo,
+        executor: str = "serial",
+        max_workers: int = os.cpu_count(),
+    ):
         super().__init__("TDS Metric")
         self.algo = algo
+        self.executor = executor
+        self.max_workers = max_workers
+        self.text_sizes: Dict[str, int] = {}
+        self.pool: Optional[Executor] = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["pool"] = None
+        return state
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def text_size(self, text: str) -> int:
+        size = self.text_sizes.get(text)
+        if size is None:
+            size = len(self.algo.func(text))
+            self.text_sizes[text] = size
+        return size
 
     def NCD1(self, texts: List[str]) -> float:
         start_time = time.time()
 
         c_X = len(self.algo.func("".join(texts)))
         # get min of C(X)
-        compressed_lengths = [len(self.algo.func(text)) for text in texts]
+        compressed_lengths = [self.text_size(text) for text in texts]
         min_length = min(compressed_lengths)
         # For each x in texts, remove x, compress the rest, get C(X\{x})
         c_x_removed = []
@@ -35,7 +93,67 @@ class TDSMetric(IterativeMetric):
         )
         return value
 
+    def leave_out_sizes(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        C(X\\{x_i}) and the symmetric matrix of C(X\\{x_i, x_j}), the
+        diagonal is C(X\\{x_i}).
+        """
+        n = len(texts)
+        c_x_removed = np.zeros(n, dtype=np.int64)
+        c_xy_removed = np.zeros((n, n), dtype=np.int64)
+        if self.pool is None:
+            self.pool = make_executor(self.executor, self.max_workers)
+        # Rows get shorter with i, striped tasks take about the same time.
+        # A task per worker sends the texts once to every worker.
+        tasks_count = max(1, min(n, self.max_workers))
+        futures = [
+            self.pool.submit(
+                _leave_out_rows_in_worker,
+                self.algo,
+                texts,
+                list(range(start, n, tasks_count)),
+            )
+            for start in range(tasks_count)
+        ]
+        for future in futures:
+            for i, c_x, c_xy in future.result():
+                c_x_removed[i] = c_x
+                c_xy_removed[i, i + 1 :] = c_xy
+        c_xy_removed += c_xy_removed.T
+        np.fill_diagonal(c_xy_removed, c_x_removed)
+        return c_x_removed, c_xy_removed
+
     def calc(self, texts: List[str]) -> IterativeMetricCalculationResult:
+        if len(texts) < 3:
+            # NCD1 of single texts, not worth a pool
+            return self.calc_each(texts)
+        start_time = time.time()
+
+        c_x_removed, c_xy_removed = self.leave_out_sizes(texts)
+
+        # min of C(x) without text i: the smallest, or the second smallest for it
+        text_sizes = np.array([self.text_size(text) for text in texts])
+        order = np.argsort(text_sizes, kind="stable")
+        min_lengths = np.full(len(texts), text_sizes[order[0]])
+        min_lengths[order[0]] = text_sizes[order[1]]
+
+        np.fill_diagonal(c_xy_removed, -1)
+        values = (c_x_removed - min_lengths) / c_xy_removed.max(axis=1)
+        # The first maximum, as the loop over NCD1 values would pick
+        best = int(np.argmax(values))
+        best_texts = texts[:best] + texts[best + 1 :]
+
+        elapsed = time.time() - start_time
+        print(
+            f"[TDSM]. Algo: {self.algo.name}. calc: elapsed {elapsed:.4f}s for {len(texts)} texts"
+        )
+        return IterativeMetricCalculationResult(
+            value=float(values[best]),
+            texts=best_texts,
+            finished=len(best_texts) <= 2,
+        )
+
+    def calc_each(self, texts: List[str]) -> IterativeMetricCalculationResult:
         max_value = float("-inf")
         best_texts = texts
         for i in range(len(texts)):
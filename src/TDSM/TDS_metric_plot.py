@@ -1,16 +1,32 @@
-from typing import List
+from typing import Dict, List, Optional
 
 import matplotlib.pyplot as plt
 
+from texts_diversity.algo import StreamCompressAlgo
 from texts_diversity.files_list import FilesList
 from texts_diversity.plot import Plot
-from texts_diversity.utils import save_plot_safely
+from texts_diversity.plot_renderer import PlotRenderer, render_plot
 from src.TDSM.TDS_metric import TDSMetric
+from src.TDSM.stream_compress_sizes import StreamCompressGrowth
 
 
 class TDSMetricPlot:
+    """
+    TDS metric of the growing prefix of files. With incremental=True the
+    metrics of streaming algos append every file to a StreamCompressGrowth
+    instead of computing NCD1 of the whole prefix again (the values match
+    NCD1 within a tolerance). The plot is saved every `draw_every` files
+    and once at the end.
+    """
+
     def __init__(
-        self, files_list: FilesList, metrics: List[TDSMetric], output_file: str
+        self,
+        files_list: FilesList,
+        metrics: List[TDSMetric],
+        output_file: str,
+        incremental: bool = False,
+        draw_every: int = 1,
+        renderer: Optional[PlotRenderer] = None,
     ):
         self.files_list = files_list
         self.metrics = metrics
@@ -18,15 +34,26 @@ class TDSMetricPlot:
         self.y_values = {metric.algo.name: [] for metric in self.metrics}
         self.x_values = []
         self.output_file = output_file
+        self.draw_every = draw_every
+        self.renderer = renderer
+        self.growths = {
+            metric.algo.name: StreamCompressGrowth(metric.algo)
+            for metric in self.metrics
+            if incremental and isinstance(metric.algo, StreamCompressAlgo)
+        }
 
     def make_plot(self):
         self.files_list.for_each(self.process_file)
+        if len(self.x_values) % self.draw_every:
+            self.draw()
 
     def process_file(self, file_path: str):
         with open(file_path, "r", encoding="utf-8") as f:
             new_file_content = f.read()
 
         self.texts.append(new_file_content)
+        for growth in self.growths.values():
+            growth.append(new_file_content)
 
         if len(self.texts) < 2:
             return
@@ -34,27 +61,46 @@ class TDSMetricPlot:
         self.x_values.append(len(self.texts))
 
         for metric in self.metrics:
-            result = metric.NCD1(self.texts)
+            growth = self.growths.get(metric.algo.name)
+            if growth is None:
+                result = metric.NCD1(self.texts)
+            else:
+                result = self.growth_NCD1(metric, growth)
             self.y_values[metric.algo.name].append(result)
 
-        self.draw()
+        if len(self.x_values) % self.draw_every == 0:
+            self.draw()
 
-    def draw(self):
-        fig, ax = plt.subplots(1, 1, figsize=(10, 6))
+    def growth_NCD1(self, metric: TDSMetric, growth: StreamCompressGrowth) -> float:
+        # Sizes of single texts are cached by the metric
+        min_length = min(metric.text_size(text) for text in self.texts)
+        return float((growth.total - min_length) / growth.leave_out_sizes().max())
 
+    def draw(self):
         series = {}
         for metric in self.metrics:
-            series[metric.algo.name] = self.y_values[metric.algo.name]
-
-        plot = Plot(
-            ax=ax,
-            x_values=self.x_values,
-            series=series,
-            y_name="TDS Metric Value",
-            title="TDS Metric vs Number of Texts",
-            x_name="Number of Texts",
+            series[metric.algo.name] = list(self.y_values[metric.algo.name])
+
+        render_plot(
+            self.renderer,
+            self.output_file,
+            draw_tds_metric_plot,
+            list(self.x_values),
+            series,
         )
 
-        plot.draw()
 
-        save_plot_safely(fig, self.output_file)
+def draw_tds_metric_plot(x_values: List[int], series: Dict[str, List[float]]):
+    fig, ax = plt.subplots(1, 1, figsize=(10, 6))
+
+    plot = Plot(
+        ax=ax,
+        x_values=x_values,
+        series=series,
+        y_name="TDS Metric Value",
+        title="TDS Metric vs Number of Texts",
+        x_name="Number of Texts",
+    )
+
+    plot.draw()
+    return fig
@@ -0,0 +1,48 @@
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+from texts_diversity.algo import StreamCompressAlgo
+from src.TDSM.TDS_metric import TDSMetric
+from src.TDSM.stream_compress_sizes import StreamCompressSizes
+
+
+class IncrementalTDSMetric(TDSMetric):
+    """
+    TDSMetric with the leave-one-out and leave-two-out compressed sizes
+    taken from StreamCompressSizes. NCD1 compresses the corpus once plus
+    about one compressor window per text, calc() computes the NCD1 of
+    every leave-one-out subset from a single pass as well, through
+    leave_out_sizes().
+
+    Sync flushes shift the values by up to about half a percent from
+    TDSMetric. On corpora of similar texts the leave-one-out values are
+    closer to each other than that, so calc() may remove a different
+    text than TDSMetric.calc() does. Telling them apart exactly would
+    take the TDSMetric compressions of most candidates.
+    """
+
+    def __init__(self, algo: StreamCompressAlgo):
+        super().__init__(algo)
+        self.name = "Incremental TDS Metric"
+
+    def NCD1(self, texts: List[str]) -> float:
+        if len(texts) < 2:
+            return super().NCD1(texts)
+        start_time = time.time()
+
+        sizes = StreamCompressSizes(self.algo, texts)
+        c_x_removed, _ = sizes.leave_out_sizes()
+        value = (
+            sizes.total - min(self.text_size(text) for text in texts)
+        ) / c_x_removed.max()
+
+        elapsed = time.time() - start_time
+        print(
+            f"[TDSM]. Algo: {self.algo.name}. Incremental NCD1: elapsed {elapsed:.4f}s for {len(texts)} texts"
+        )
+        return float(value)
+
+    def leave_out_sizes(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        return StreamCompressSizes(self.algo, texts).leave_out_sizes(pairs=True)
@@ -0,0 +1,138 @@
+import os
+import struct
+from collections import Counter
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from src.basic.counter_report import CounterReport
+
+MAGIC = b"CNTLOG1\n"
+ROUND_TAG = b"R"
+# Files with these extensions are written as CounterLog, others as JSON
+COUNTER_LOG_EXTENSIONS = (".cntlog", ".bin")
+
+
+class CounterLog:
+    """
+    Append-only binary removal counter. The file paths are written once
+    and every round appends only the indices of the removed files:
+
+        MAGIC
+        uint32 files count, uint32 table size, "\\0"-joined utf-8 paths
+        per round: b"R", uint32 indices count, uint32 indices
+
+    Has the CounterReport interface, so KneeCut and the mark runs can use
+    either. The counter of any round can be reconstructed with
+    load_counter(rounds).
+    """
+
+    def __init__(self, output_file: str):
+        self.output_file = output_file
+        self.counter: Optional[Counter] = None
+        self.file_names: List[str] = []
+        self.file_indices = {}
+        self.started = False
+
+    def set_counter(self, counter: Counter):
+        self.counter = counter
+        self.file_names = list(counter)
+        self.file_indices = {name: idx for idx, name in enumerate(self.file_names)}
+
+    def start(self):
+        """Start a new log with the file table of the counter."""
+        table = "\0".join(self.file_names).encode("utf-8")
+        with open(self.output_file, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<II", len(self.file_names), len(table)))
+            f.write(table)
+        self.started = True
+
+    def save_round(self, removed_file_names: List[str]):
+        if not self.started:
+            self.start()
+        indices = np.array(
+            [self.file_indices[name] for name in removed_file_names], dtype="<u4"
+        )
+        with open(self.output_file, "ab") as f:
+            f.write(ROUND_TAG + struct.pack("<I", len(indices)))
+            f.write(indices.tobytes())
+
+    def save(self):
+        # Rounds are appended by save_round(), nothing to rewrite
+        if not self.started:
+            self.start()
+
+    def read(self) -> Tuple[List[str], List[np.ndarray], List[int]]:
+        """File paths, removed indices of every round and round end offsets."""
+        with open(self.output_file, "rb") as f:
+            data = f.read()
+        if not data.startswith(MAGIC):
+            raise ValueError(f"{self.output_file} is not a counter log")
+
+        offset = len(MAGIC)
+        files_count, table_size = struct.unpack_from("<II", data, offset)
+        offset += 8
+        table = data[offset : offset + table_size].decode("utf-8")
+        file_names = table.split("\0") if files_count else []
+        offset += table_size
+
+        rounds = []
+        round_ends = []
+        while offset + 5 <= len(data) and data[offset : offset + 1] == ROUND_TAG:
+            (count,) = struct.unpack_from("<I", data, offset + 1)
+            end = offset + 5 + 4 * count
+            if end > len(data):
+                # A round cut short by a crash
+                break
+            rounds.append(
+                np.frombuffer(data, dtype="<u4", count=count, offset=offset + 5)
+            )
+            round_ends.append(end)
+            offset = end
+        return file_names, rounds, round_ends
+
+    def load_counter(self, rounds: Optional[int] = None):
+        """Counter after the first `rounds` rounds (all rounds by default)."""
+        file_names, all_rounds, _ = self.read()
+        selected = all_rounds if rounds is None else all_rounds[:rounds]
+        counts = np.zeros(len(file_names), dtype=np.int64)
+        for indices in selected:
+            counts += np.bincount(indices, minlength=len(file_names))
+        self.counter = Counter(dict(zip(file_names, counts.tolist())))
+        self.file_names = file_names
+        self.file_indices = {name: idx for idx, name in enumerate(file_names)}
+
+    def rounds_count(self) -> int:
+        return len(self.read()[1])
+
+    def resume(self, rounds: int):
+        """Continue the log after `rounds` rounds, dropping later ones."""
+        if not os.path.exists(self.output_file):
+            self.start()
+            return
+        file_names, _, round_ends = self.read()
+        if file_names != self.file_names:
+            raise ValueError(f"{self.output_file} logs different files")
+        if rounds > len(round_ends):
+            raise ValueError(
+                f"{self.output_file} has {len(round_ends)} rounds, can not resume after {rounds}"
+            )
+
+        end = round_ends[rounds - 1] if rounds else self.table_end()
+        with open(self.output_file, "r+b") as f:
+            f.truncate(end)
+        self.started = True
+
+    def table_end(self) -> int:
+        with open(self.output_file, "rb") as f:
+            header = f.read(len(MAGIC) + 8)
+        _, table_size = struct.unpack_from("<II", header, len(MAGIC))
+        return len(MAGIC) + 8 + table_size
+
+
+def open_counter_report(output_file: str):
+    """CounterLog for COUNTER_LOG_EXTENSIONS, JSON CounterReport otherwise."""
+    if output_file.endswith(COUNTER_LOG_EXTENSIONS):
+        return CounterLog(output_file)
+    return CounterReport(output_file)
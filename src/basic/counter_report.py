@@ -1,5 +1,6 @@
 import json
 from collections import Counter
+from typing import List
 
 
 class CounterReport:
@@ -17,3 +18,11 @@ class CounterReport:
     def save(self):
         with open(self.output_file, "w") as f:
             json.dump(dict(self.counter), f, indent=2)
+
+    def save_round(self, removed_file_names: List[str]):
+        # The counter already includes the round, it is rewritten whole
+        self.save()
+
+    def resume(self, rounds: int):
+        # The counter restored from a checkpoint is written by the next save
+        pass
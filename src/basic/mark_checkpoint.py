@@ -0,0 +1,104 @@
+import logging
+import os
+import pickle
+import random
+from collections import Counter
+from typing import Optional
+
+import numpy as np
+
+
+class MarkCheckpoint:
+    """
+    Checkpoint of a marking run (SplitMarkResult or SplitPlots) after a
+    round: the round index, the removal counter, the order of the files
+    that the next shuffle starts from, the state of `random` and the
+    early stopping state. A run resumed from it produces the same final
+    counter as an uninterrupted one.
+
+    With save_distances=True the computed values of the sets split's
+    distances oracle are saved to `<path>.distances.npy` as well, and the
+    mask of the computed pairs to `<path>.computed.npy`, so a resumed run
+    does not compute them again. The matrix is O(N^2), it is written only
+    after rounds that computed new values.
+    """
+
+    def __init__(self, path: str, save_distances: bool = False):
+        self.path = path
+        self.save_distances = save_distances
+        # Missing values count of the saved matrix
+        self.saved_missing: Optional[int] = None
+
+    @property
+    def distances_path(self) -> str:
+        return f"{self.path}.distances.npy"
+
+    @property
+    def computed_path(self) -> str:
+        return f"{self.path}.computed.npy"
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def save(self, run):
+        state = {
+            "iter": run.iter,
+            "removes_counter": dict(run.removes_counter),
+            "current_file_names": list(run.sets_split.current_file_names),
+            "random_state": random.getstate(),
+            "convergence": run.convergence,
+        }
+        oracle = run.sets_split.oracle
+        if oracle is not None:
+            state["oracle_stats"] = (oracle.requested_pairs, oracle.misses)
+        # Written next to the old checkpoint and swapped in, so a crash
+        # while saving keeps the previous round
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+        if self.save_distances and oracle is not None:
+            # Values are only ever filled in, so an unchanged count of
+            # missing values means an unchanged matrix
+            missing = oracle.store.missing_count()
+            if missing != self.saved_missing:
+                for path, values in (
+                    (self.distances_path, oracle.store.buffer),
+                    (self.computed_path, oracle.store.computed),
+                ):
+                    tmp_path = f"{path}.tmp.npy"
+                    np.save(tmp_path, values)
+                    os.replace(tmp_path, path)
+                self.saved_missing = missing
+
+    def restore(self, run):
+        with open(self.path, "rb") as f:
+            state = pickle.load(f)
+
+        run.iter = state["iter"]
+        run.removes_counter.clear()
+        run.removes_counter.update(Counter(state["removes_counter"]))
+        run.sets_split.current_file_names[:] = state["current_file_names"]
+        run.counter_report.resume(run.iter)
+        random.setstate(state["random_state"])
+        if run.convergence is not None and state["convergence"] is not None:
+            run.convergence = state["convergence"]
+
+        oracle = run.sets_split.oracle
+        if oracle is not None and "oracle_stats" in state:
+            oracle.requested_pairs, oracle.misses = state["oracle_stats"]
+        if self.save_distances and oracle is not None:
+            if os.path.exists(self.distances_path):
+                oracle.store.buffer[:] = np.load(self.distances_path)
+                if os.path.exists(self.computed_path):
+                    oracle.store.computed[:] = np.load(self.computed_path)
+                else:
+                    # Saved before the mask: failed pairs are computed again
+                    oracle.store.computed[:] = ~np.isnan(oracle.store.buffer)
+                self.saved_missing = oracle.store.missing_count()
+                if not self.saved_missing:
+                    # Nothing is left for an eager precompute
+                    run.sets_split.shared_distances_mode = "lazy"
+
+        logging.info(f"Resumed from {self.path} after round {run.iter}")
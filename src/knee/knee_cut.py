@@ -1,6 +1,6 @@
 import logging
 
-from src.basic.counter_report import CounterReport
+from src.basic.counter_log import open_counter_report
 from src.knee.knee import Knee
 from src.basic.simple_filter_report import SimpleFilterReport
 
@@ -17,7 +17,7 @@ class KneeCut:
         self.cut_result_file = cut_result_file
 
     def cut(self):
-        counter_report = CounterReport(output_file=self.counter_report_file)
+        counter_report = open_counter_report(self.counter_report_file)
         counter_report.load_counter()
 
         logging.info(f"Loaded counter report from {self.counter_report_file}")
@@ -0,0 +1,87 @@
+import logging
+from collections import Counter
+from typing import List, Optional
+
+import numpy as np
+from scipy.stats import spearmanr
+
+from src.knee.knee import Knee
+
+
+class MarksConvergence:
+    """
+    Early stopping rule for mark rounds. After every round the removal
+    counts are compared with the previous round: the ranking of the files
+    (Spearman correlation of the counts) and the knee position KneeCut
+    would use (as a fraction of the files). The marks are converged when
+    both stayed within tolerance for `patience` rounds in a row, but not
+    before `min_rounds` rounds.
+    """
+
+    def __init__(
+        self,
+        min_rounds: int = 10,
+        patience: int = 3,
+        rank_tolerance: float = 0.01,
+        knee_tolerance: float = 0.01,
+    ):
+        self.min_rounds = min_rounds
+        self.patience = patience
+        self.rank_tolerance = rank_tolerance
+        self.knee_tolerance = knee_tolerance
+        self.rounds = 0
+        self.stable_rounds = 0
+        self.previous_counts: Optional[np.ndarray] = None
+        self.previous_knee: Optional[float] = None
+
+    @staticmethod
+    def knee_position(counts: np.ndarray) -> Optional[float]:
+        """Knee of the counts sorted like KneeCut sorts them, in [0, 1]."""
+        y_values = sorted(counts.tolist(), reverse=True)
+        try:
+            knee_point = Knee(
+                x_values=list(range(len(y_values))), y_values=y_values
+            ).find_knee()
+        except (TypeError, ValueError):
+            # No knee found yet
+            return None
+        return knee_point / max(1, len(y_values) - 1)
+
+    def is_round_stable(self, counts: np.ndarray, knee: Optional[float]) -> bool:
+        if self.previous_counts is None or knee is None or self.previous_knee is None:
+            return False
+        if np.all(counts == counts[0]) or np.all(
+            self.previous_counts == self.previous_counts[0]
+        ):
+            # The ranking of constant counts is undefined
+            return False
+
+        rank_correlation = spearmanr(self.previous_counts, counts).correlation
+        knee_shift = abs(knee - self.previous_knee)
+        logging.debug(
+            f"Round {self.rounds}. Rank correlation with the previous round: {rank_correlation:.4f}. Knee shift: {knee_shift:.4f}."
+        )
+        return (
+            rank_correlation >= 1 - self.rank_tolerance
+            and knee_shift <= self.knee_tolerance
+        )
+
+    def update(self, counter: Counter, file_names: List[str]) -> bool:
+        """Record the counts after a round. True when the marks converged."""
+        self.rounds += 1
+        counts = np.array([counter.get(name, 0) for name in file_names], dtype=float)
+        knee = self.knee_position(counts)
+
+        if self.is_round_stable(counts, knee):
+            self.stable_rounds += 1
+        else:
+            self.stable_rounds = 0
+
+        self.previous_counts = counts
+        self.previous_knee = knee
+        return self.rounds >= self.min_rounds and self.stable_rounds >= self.patience
+
+    def log_saved_rounds(self, max_iter: int):
+        logging.info(
+            f"Marks converged after {self.rounds} rounds, saved {max_iter - self.rounds} of {max_iter} rounds"
+        )
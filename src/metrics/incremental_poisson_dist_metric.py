@@ -0,0 +1,360 @@
+import math
+import threading
+import weakref
+from functools import partial
+from typing import List, Optional, Tuple
+
+import numpy as np
+from scipy.stats import poisson
+
+from texts_diversity.metric import Metric
+from texts_diversity.texts_distances import TextsDistances, TextsDistancesView
+from src.metrics.poisson_dist_metric import (
+    POISSON_WEIGHTS_TOLERANCE,
+    calc_fast_poisson_distribution,
+    poisson_window_start,
+)
+
+
+def removed_pairs(
+    present_indices: np.ndarray, removed_indices: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pairs of present texts that disappear when `removed_indices` are
+    removed: every removed text with every kept text, and the pairs
+    inside the removed texts.
+    """
+    kept = np.setdiff1d(present_indices, removed_indices, assume_unique=True)
+    from_indices = np.repeat(removed_indices, len(kept))
+    to_indices = np.tile(kept, len(removed_indices))
+
+    inner_from, inner_to = np.triu_indices(len(removed_indices), k=1)
+    return (
+        np.concatenate([from_indices, removed_indices[inner_from]]),
+        np.concatenate([to_indices, removed_indices[inner_to]]),
+    )
+
+
+def weighted_window(sorted_window: np.ndarray, n: int) -> float:
+    """Poisson metric of n values whose largest values are `sorted_window`."""
+    start = n - len(sorted_window)
+    weights = poisson.pmf(np.arange(start, n), n)
+    return float(np.sum(2 * sorted_window * weights))
+
+
+def calc_poisson_distribution_batch(
+    sorted_values: np.ndarray,
+    sorted_from: np.ndarray,
+    sorted_to: np.ndarray,
+    keep_masks: np.ndarray,
+    tolerance: float = POISSON_WEIGHTS_TOLERANCE,
+) -> np.ndarray:
+    """
+    Poisson_dist of every candidate subset in one pass. sorted_values are
+    the values of all pairs in ascending order and (sorted_from[k],
+    sorted_to[k]) is the pair of sorted_values[k]. A pair belongs to
+    candidate c when keep_masks[c] keeps both of its texts.
+
+    Only a suffix of the sorted values is masked: it is doubled until it
+    holds the weights window of every candidate.
+    """
+    n = len(sorted_values)
+    kept_texts = np.zeros(len(keep_masks), dtype=np.int64)
+    if n:
+        kept_texts = keep_masks[:, np.union1d(sorted_from, sorted_to)].sum(axis=1)
+    pairs_counts = kept_texts * (kept_texts - 1) // 2
+    window_sizes = np.array(
+        [
+            count - poisson_window_start(count, tolerance) if count else 0
+            for count in pairs_counts
+        ],
+        dtype=np.int64,
+    )
+
+    suffix = min(n, 2 * int(window_sizes.max(initial=0)))
+    while True:
+        pair_masks = (
+            keep_masks[:, sorted_from[n - suffix :]]
+            & keep_masks[:, sorted_to[n - suffix :]]
+        )
+        if suffix == n or (pair_masks.sum(axis=1) >= window_sizes).all():
+            break
+        suffix = min(n, 2 * suffix)
+
+    # 1-based rank of every kept pair counted from the largest value
+    ranks_from_top = np.cumsum(pair_masks[:, ::-1], axis=1)[:, ::-1]
+    in_window = pair_masks & (ranks_from_top <= window_sizes[:, None])
+    weights = poisson.pmf(pairs_counts[:, None] - ranks_from_top, pairs_counts[:, None])
+    return np.sum(
+        np.where(in_window, 2 * sorted_values[n - suffix :] * weights, 0.0), axis=1
+    )
+
+
+class GrownTopValues:
+    """
+    The largest values of distances that only gain texts, for the growth
+    curve of Poisson_dist. Only ranks inside the weights window have weight
+    and the window keeps to the top O(sqrt(n)) values, so the values of a
+    new row that are below `top` are only counted. The rest are
+    merge-inserted into `top`, which is trimmed to `margin` windows.
+    When the window reaches below `top`, `top` is selected again from all
+    values, which happens O(log n) times over a curve.
+    """
+
+    margin = 2
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self, distances: Optional[TextsDistances] = None):
+        """Start over with nothing counted for `distances`."""
+        self.distances: Optional[weakref.ref] = (
+            None if distances is None else weakref.ref(distances)
+        )
+        self.removals = 0
+        self.texts_count = 0
+        self.pairs_count = 0
+        self.below_count = 0
+        self.top = np.empty(0, dtype=np.float64)
+
+    def new_values(self, distances: TextsDistances, texts_count: int) -> np.ndarray:
+        """Values of the pairs of texts added since the last update."""
+        to_indices = np.repeat(
+            np.arange(self.texts_count, texts_count),
+            np.arange(self.texts_count, texts_count),
+        )
+        from_indices = np.concatenate(
+            [np.arange(to_idx) for to_idx in range(self.texts_count, texts_count)]
+            + [np.empty(0, dtype=np.int64)]
+        )
+        return distances.pair_values(from_indices, to_indices)
+
+    def select_top(self, distances: TextsDistances, keep: int):
+        values = distances.get_normalized_values()
+        self.below_count = len(values) - keep
+        self.top = np.sort(np.partition(values, self.below_count)[self.below_count :])
+
+    def update(self, distances: TextsDistances, tolerance: float) -> Optional[float]:
+        """
+        Poisson_dist of the grown distances, None when they are not the
+        distances of the last update with texts 0, 1, ... added.
+        """
+        if isinstance(distances, TextsDistancesView):
+            # Views number the texts of their parent, any may be missing
+            return None
+        pairs_count = distances.pairs_count()
+        texts_count = (1 + math.isqrt(1 + 8 * pairs_count)) // 2
+        if texts_count * (texts_count - 1) // 2 != pairs_count:
+            return None
+        if (
+            self.distances is None
+            or self.distances() is not distances
+            or distances.removals != self.removals
+            or texts_count < self.texts_count
+        ):
+            present_indices = distances.present_indices()
+            # Sorted and unique, so only 0, 1, ..., texts_count - 1 pass
+            if len(present_indices) != texts_count or (
+                texts_count and present_indices[-1] != texts_count - 1
+            ):
+                return None
+            self.reset(distances)
+            self.removals = distances.removals
+
+        # Without removals the texts 0, 1, ... of the last update are still
+        # there, and with all new pairs the pairs count leaves no room for
+        # other texts
+        try:
+            values = self.new_values(distances, texts_count)
+        except ValueError:
+            return None
+        if np.isnan(values).any():
+            return None
+        self.texts_count = texts_count
+        self.pairs_count = pairs_count
+        if not pairs_count:
+            return 0.0
+
+        threshold = self.top[0] if len(self.top) else -np.inf
+        if self.below_count == 0:
+            # Nothing was dropped yet, every value belongs to top
+            threshold = -np.inf
+        above = np.sort(values[values >= threshold])
+        self.below_count += len(values) - len(above)
+        self.top = np.insert(self.top, np.searchsorted(self.top, above), above)
+
+        window_size = pairs_count - poisson_window_start(pairs_count, tolerance)
+        if self.below_count > pairs_count - window_size:
+            self.select_top(distances, min(pairs_count, self.margin * window_size))
+        elif len(self.top) > 2 * self.margin * window_size:
+            dropped = len(self.top) - self.margin * window_size
+            self.top = self.top[dropped:]
+            self.below_count += dropped
+        return weighted_window(self.top[-window_size:], pairs_count)
+
+
+class IncrementalPoissonDistMetric(Metric):
+    """
+    Poisson_dist that evaluates removals of a few texts without sorting the
+    remaining values again. The values of the current distances are sorted
+    once; a removal of k texts gathers the k*N values of the removed pairs,
+    finds their ranks with binary search and drops them from the weights
+    window only, which is O(k*N*log(N)). Many candidate subsets can be
+    evaluated at once with calc_batch(), and the growth curve of distances
+    that only gain texts is updated from the new rows with calc_grown().
+
+    The sorted values are cached per distances object and set of present
+    texts, so they are rebuilt when texts are added or removed, but not
+    when a distance is overwritten with set_distance(). The cache is
+    replaced as a whole under a lock, so threads can share the metric.
+    """
+
+    def __init__(self, tolerance: float = POISSON_WEIGHTS_TOLERANCE):
+        super().__init__(
+            "Poisson_dist",
+            partial(calc_fast_poisson_distribution, tolerance=tolerance),
+            self.calc_without_idxs,
+            self.calc_keep_masks,
+            self.calc_grown_distances,
+        )
+        self.tolerance = tolerance
+        self._init_caches()
+        self._grown = GrownTopValues()
+
+    def _init_caches(self):
+        self._lock = threading.Lock()
+        # (weakref to distances, present indices, sorted values, sorted pairs)
+        self._sorted: Optional[tuple] = None
+
+    def __getstate__(self):
+        # The caches are rebuilt in the receiving process
+        state = self.__dict__.copy()
+        for name in ("_lock", "_sorted"):
+            del state[name]
+        state["_grown"] = GrownTopValues()
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_caches()
+
+    def cached_sorted(self, distances: TextsDistances, present: bytes):
+        with self._lock:
+            cached = self._sorted
+        if cached is None or cached[0]() is not distances or cached[1] != present:
+            return None
+        return cached
+
+    def sorted_values(self, distances: TextsDistances) -> np.ndarray:
+        present = distances.present_indices().tobytes()
+        cached = self.cached_sorted(distances, present)
+        if cached is not None:
+            return cached[2]
+        sorted_values = np.sort(distances.get_normalized_values())
+        with self._lock:
+            self._sorted = (weakref.ref(distances), present, sorted_values, None)
+        return sorted_values
+
+    def sorted_pairs(
+        self, distances: TextsDistances
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """sorted_values() with the text indices of every value."""
+        present = distances.present_indices().tobytes()
+        cached = self.cached_sorted(distances, present)
+        if cached is not None and cached[3] is not None:
+            return (cached[2], *cached[3])
+
+        from_indices, to_indices, values = distances.pairs()
+        order = np.argsort(values, kind="stable")
+        sorted_pairs = (from_indices[order], to_indices[order])
+        # The same order as np.sort, NaN values are last in both
+        sorted_values = cached[2] if cached is not None else values[order]
+        with self._lock:
+            self._sorted = (
+                weakref.ref(distances),
+                present,
+                sorted_values,
+                sorted_pairs,
+            )
+        return (sorted_values, *sorted_pairs)
+
+    def calc_without_idxs(
+        self, distances: TextsDistances, idxs_to_remove: List[int]
+    ) -> float:
+        if distances.normalize or distances.chunk_size is not None:
+            # Normalization depends on all remaining values and chunked
+            # values do not fit in memory, so nothing can be reused
+            return self.calc(distances.without(idxs_to_remove))
+
+        present_indices = distances.present_indices()
+        removed_indices = np.intersect1d(
+            present_indices, np.asarray(idxs_to_remove, dtype=np.int64)
+        )
+        sorted_values = self.sorted_values(distances)
+        n = len(sorted_values)
+        if n and np.isnan(sorted_values[-1]):
+            # NaN sorts last and can not be located with binary search
+            return self.calc(distances.without(idxs_to_remove))
+
+        removed_values = np.sort(
+            distances.pair_values(*removed_pairs(present_indices, removed_indices))
+        )
+        new_n = n - len(removed_values)
+        if new_n <= 0:
+            return 0.0
+
+        # Equal values are interchangeable, so the i-th duplicate of a value
+        # takes the i-th position of that value in sorted_values
+        positions = np.searchsorted(sorted_values, removed_values, side="left")
+        positions += np.arange(len(removed_values)) - np.searchsorted(
+            removed_values, removed_values, side="left"
+        )
+
+        window_size = new_n - poisson_window_start(new_n, self.tolerance)
+        # At most len(removed_values) values of this slice are removed, so at
+        # least window_size values are left in it
+        low = max(0, n - window_size - len(removed_values))
+        window = np.delete(sorted_values[low:], positions[positions >= low] - low)
+        return weighted_window(window[-window_size:], new_n)
+
+    def calc_grown_distances(self, distances: TextsDistances) -> float:
+        if distances.normalize or distances.chunk_size is not None:
+            return self.calc(distances)
+        with self._lock:
+            value = self._grown.update(distances, self.tolerance)
+            if value is None:
+                self._grown.reset()
+        if value is None:
+            return self.calc(distances)
+        return value
+
+    def calc_keep_masks(
+        self, distances: TextsDistances, keep_masks: np.ndarray
+    ) -> np.ndarray:
+        if distances.normalize or distances.chunk_size is not None:
+            # Checked before sorting: chunked values do not fit in memory
+            return self.calc_subsets(distances, keep_masks)
+        sorted_values = self.sorted_values(distances)
+        if len(sorted_values) and np.isnan(sorted_values[-1]):
+            return self.calc_subsets(distances, keep_masks)
+
+        sorted_values, sorted_from, sorted_to = self.sorted_pairs(distances)
+        # Texts past the end of the masks are not kept
+        width = int(distances.present_indices().max(initial=-1)) + 1
+        masks = np.zeros((len(keep_masks), max(width, keep_masks.shape[1])), dtype=bool)
+        masks[:, : keep_masks.shape[1]] = keep_masks
+        return calc_poisson_distribution_batch(
+            sorted_values, sorted_from, sorted_to, masks, self.tolerance
+        )
+
+    def calc_subsets(
+        self, distances: TextsDistances, keep_masks: np.ndarray
+    ) -> np.ndarray:
+        return np.array(
+            [self.calc(distances.subset(mask)) for mask in keep_masks],
+            dtype=np.float64,
+        )
+
+
+def incremental_poisson_dist_metric(tolerance: float = POISSON_WEIGHTS_TOLERANCE):
+    return IncrementalPoissonDistMetric(tolerance)
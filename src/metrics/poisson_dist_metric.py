@@ -1,17 +1,77 @@
+from functools import partial
+
+import numpy as np
 from scipy.stats import poisson
 
 from texts_diversity.metric import Metric
 from texts_diversity.texts_distances import TextsDistances
+from texts_diversity.chunked_values import chunked_sum_count, select_ranks
+
+# Weights of ranks below poisson.ppf(tolerance, n) are dropped by the
+# selection-based metrics
+POISSON_WEIGHTS_TOLERANCE = 1e-12
+
+
+def poisson_window_start(n: int, tolerance: float) -> int:
+    """
+    First rank whose pmf(rank, n) weight is kept. With lambda = n the
+    weights are negligible outside a few sqrt(n) ranks around n, and ranks
+    only go up to n - 1, so only the largest values matter.
+    """
+    return int(min(max(poisson.ppf(tolerance, n), 0), n - 1))
+
+
+def calc_chunked_poisson_distribution(
+    distances: TextsDistances, tolerance: float = POISSON_WEIGHTS_TOLERANCE
+) -> float:
+    """
+    Same value as calc_poisson_distribution for distances that do not fit
+    in memory. Only the ranks with non-negligible pmf weight are selected
+    and sorted.
+    """
+    _, count, nan_count = chunked_sum_count(distances.iter_value_chunks)
+    if nan_count:
+        # NaN sorts last, where the weights are the largest
+        return float("nan")
+    if not count:
+        return 0.0
+
+    start = poisson_window_start(count, tolerance)
+    distance_values = select_ranks(distances.iter_value_chunks, start, count)
+    weights = poisson.pmf(np.arange(start, count), count)
+    return float(np.sum(2 * distance_values * weights))
+
+
+def calc_fast_poisson_distribution(
+    distances: TextsDistances, tolerance: float = POISSON_WEIGHTS_TOLERANCE
+) -> float:
+    """
+    calc_poisson_distribution without sorting all values: np.partition
+    extracts the order statistics inside the weights window, and only
+    those are sorted and weighted.
+    """
+    if distances.chunk_size is not None:
+        return calc_chunked_poisson_distribution(distances, tolerance)
+
+    values = distances.get_normalized_values()
+    n = len(values)
+    if not n:
+        return 0.0
+
+    start = poisson_window_start(n, tolerance)
+    window = np.sort(np.partition(values, start)[start:])
+    weights = poisson.pmf(np.arange(start, n), n)
+    return float(np.sum(2 * window * weights))
 
 
 def calc_poisson_distribution(distances: TextsDistances) -> float:
-    distance_values = distances.get_normalized_values()
-    distance_values.sort()
-    values = []
-    for i in range(len(distance_values)):
-        value = 2 * distance_values[i] * poisson.pmf(i, len(distance_values))
-        values.append(value)
-    return sum(values)
+    if distances.chunk_size is not None:
+        return calc_chunked_poisson_distribution(distances)
+
+    distance_values = np.sort(distances.get_normalized_values())
+    n = len(distance_values)
+    weights = poisson.pmf(np.arange(n), n)
+    return float(np.sum(2 * distance_values * weights))
 
 
 class PoissonDistMetric(Metric):
@@ -21,3 +81,16 @@ class PoissonDistMetric(Metric):
 
 def poisson_dist_metric():
     return PoissonDistMetric()
+
+
+class FastPoissonDistMetric(Metric):
+    def __init__(self, tolerance: float = POISSON_WEIGHTS_TOLERANCE):
+        super().__init__(
+            "Poisson_dist",
+            partial(calc_fast_poisson_distribution, tolerance=tolerance),
+        )
+        self.tolerance = tolerance
+
+
+def fast_poisson_dist_metric(tolerance: float = POISSON_WEIGHTS_TOLERANCE):
+    return FastPoissonDistMetric(tolerance)
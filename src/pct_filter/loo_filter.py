@@ -0,0 +1,118 @@
+from typing import Dict, List
+import logging
+import time
+
+import numpy as np
+
+from texts_diversity.calc_info import CalcInfo
+
+
+class LooFilter:
+    """
+    Greedy alternative to PctFilter with the same is_finished / iterate()
+    protocol. The contribution of a text is how much the metric drops when
+    it is removed alone. Every iteration removes a batch of the texts with
+    the lowest contributions if the metric drops by at most relative_eps,
+    halving the batch until it does.
+
+    Contributions of all texts are computed with one values_for_keep_masks()
+    call. After a removal they become stale, and only the
+    `rescore_factor * batch_size` texts with the lowest stale contributions
+    are scored again.
+    """
+
+    def __init__(
+        self,
+        initial_indices: List[int],
+        relative_eps: float,
+        intial_metric_value: float,
+        min_indices_count: int,
+        calc_info: CalcInfo,
+        batch_pct: float = 0.05,
+        rescore_factor: int = 4,
+    ):
+        self.initial_indices = initial_indices
+        self.current_idxs = initial_indices
+        self.current_metric_value = intial_metric_value
+        self.relative_eps = relative_eps
+        self.min_indices_count = min_indices_count
+        self.calc_info = calc_info
+        self.batch_pct = batch_pct
+        self.rescore_factor = rescore_factor
+        self.is_finished = False
+        self.iteration = 0
+        # Number of metric values computed, for comparison with PctFilter
+        self.evaluations = 0
+        self.contributions: Dict[int, float] = {}
+
+    def keep_masks(self, removals: List[List[int]]) -> np.ndarray:
+        """Keep-masks of the current texts without each of `removals`."""
+        width = int(self.calc_info.distances.present_indices().max(initial=-1)) + 1
+        keep_masks = np.zeros((len(removals), width), dtype=bool)
+        keep_masks[:, self.current_idxs] = True
+        for keep_mask, removal in zip(keep_masks, removals):
+            keep_mask[removal] = False
+        return keep_masks
+
+    def values_without(self, removals: List[List[int]]) -> np.ndarray:
+        self.evaluations += len(removals)
+        return self.calc_info.values_for_keep_masks(self.keep_masks(removals))
+
+    def rescore(self, idxs: List[int]):
+        start_time = time.time()
+        new_values = self.values_without([[idx] for idx in idxs])
+        for idx, new_value in zip(idxs, new_values):
+            self.contributions[idx] = self.current_metric_value - float(new_value)
+        logging.debug(
+            f"Scored {len(idxs)} texts in {time.time() - start_time:.4f} seconds."
+        )
+
+    def batch_size(self) -> int:
+        return min(
+            max(1, int(len(self.current_idxs) * self.batch_pct)),
+            len(self.current_idxs) - self.min_indices_count,
+        )
+
+    def iterate(self):
+        if self.is_finished:
+            return
+
+        self.iteration += 1
+        batch_size = self.batch_size()
+        if batch_size < 1 or len(self.current_idxs) <= 2:
+            self.is_finished = True
+            return
+
+        if not self.contributions:
+            self.rescore(self.current_idxs)
+        else:
+            stale = sorted(self.current_idxs, key=self.contributions.__getitem__)
+            self.rescore(stale[: self.rescore_factor * batch_size])
+
+        candidates = sorted(self.current_idxs, key=self.contributions.__getitem__)
+        eps_change = self.relative_eps * self.current_metric_value
+
+        while batch_size >= 1:
+            batch = candidates[:batch_size]
+            new_value = float(self.values_without([batch])[0])
+            metric_change = self.current_metric_value - new_value
+            info = f"Iter {self.iteration}. Metric {self.calc_info.metric.name} x algo {self.calc_info.distances.algo.name}. Remove {batch_size} texts. Old {self.current_metric_value}. New {new_value}. Diff: {metric_change}. relative_eps*prev_value: {eps_change}."
+
+            if metric_change <= eps_change:
+                logging.info(f"Batch removed. {info}")
+                removed = set(batch)
+                self.current_idxs = [
+                    idx for idx in self.current_idxs if idx not in removed
+                ]
+                self.current_metric_value = new_value
+                for idx in batch:
+                    del self.contributions[idx]
+                return
+
+            logging.debug(f"Batch not removed. {info}")
+            batch_size //= 2
+
+        logging.info(
+            f"Iter {self.iteration}. No text can be removed. Metric evaluations: {self.evaluations}."
+        )
+        self.is_finished = True
@@ -1,9 +1,38 @@
-from typing import List, Tuple
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
 import logging
+import os
+import pickle
 import random
 import time
+import uuid
+
+import numpy as np
 
 from texts_diversity.calc_info import CalcInfo
+from texts_diversity.executors import make_executor
+
+# (token, filter) last loaded by this worker process. Pools are shared by
+# many filters, so tasks carry the pickled filter and its token.
+_worker_filter: Optional[Tuple[str, "PctFilter"]] = None
+
+
+def _try_to_remove_in_worker(
+    filter_token: str,
+    filter_state: bytes,
+    initial_indices: List[int],
+    removal_pct: float,
+    initial_metric_value: float,
+    rng_seed: str,
+) -> Tuple[List[int], float, bool]:
+    global _worker_filter
+    worker_filter = _worker_filter
+    if worker_filter is None or worker_filter[0] != filter_token:
+        worker_filter = (filter_token, pickle.loads(filter_state))
+        _worker_filter = worker_filter
+    return worker_filter[1].try_to_remove_idxs(
+        initial_indices, removal_pct, initial_metric_value, random.Random(rng_seed)
+    )
 
 
 class PctFilter:
@@ -15,7 +44,25 @@ class PctFilter:
         intial_metric_value: float,
         min_indices_count: int,
         calc_info: CalcInfo,
+        seed: Optional[Union[int, str]] = None,
+        search_executor: str = "serial",
+        max_workers: int = os.cpu_count(),
+        executor: Optional[Executor] = None,
     ):
+        """
+        With search_executor "thread" or "process" the removal percentage
+        search evaluates the midpoints of the next levels of the binary
+        search speculatively on max_workers workers. Every percentage
+        samples its removals from its own RNG derived from `seed`, the
+        iteration and the percentage, so the accepted percentage does not
+        depend on the executor. Filters that run side by side need seeds
+        of their own, e.g. "<seed>:<round>:<set>", or they draw the same
+        removal positions.
+
+        Pass a pool shared by many filters as `executor`, the filter does
+        not shut it down. Without one the filter starts its own pool,
+        close() stops it.
+        """
         self.initial_indices = initial_indices
         self.current_idxs = initial_indices
         self.current_metric_value = intial_metric_value
@@ -25,6 +72,25 @@ class PctFilter:
         self.is_finished = False
         self.iteration = 0
         self.calc_info = calc_info
+        self.seed = seed
+        self.search_executor = search_executor
+        self.max_workers = max_workers
+        self._executor = executor
+        self.owns_executor = False
+        self.token = uuid.uuid4().hex
+        self._state: Optional[bytes] = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_executor"] = None
+        state["_state"] = None
+        return state
+
+    def close(self):
+        if self.owns_executor:
+            self._executor.shutdown()
+            self._executor = None
+            self.owns_executor = False
 
     def remove_idxs_attempt(
         self,
@@ -33,11 +99,9 @@ class PctFilter:
         current_value: float,
         num_to_remove: int,
         attempt: int,
+        rng: random.Random,
     ) -> Tuple[List[int], float] | None:
-        indices_to_remove = random.sample(current_idxs, num_to_remove)
-        remaining_indices = [
-            idx for idx in current_idxs if idx not in indices_to_remove
-        ]
+        indices_to_remove = rng.sample(current_idxs, num_to_remove)
 
         start_time = time.time()
         new_value = self.metric_value_without_idxs(indices_to_remove)
@@ -46,6 +110,29 @@ class PctFilter:
             f"Metric {self.calc_info.metric.name} x algo {self.calc_info.distances.algo.name} calculation took {elapsed_time:.4f} seconds."
         )
 
+        return self.check_attempt(
+            current_idxs,
+            indices_to_remove,
+            new_value,
+            removal_pct,
+            current_value,
+            num_to_remove,
+            attempt,
+        )
+
+    def check_attempt(
+        self,
+        current_idxs: List[int],
+        indices_to_remove: List[int],
+        new_value: float,
+        removal_pct: float,
+        current_value: float,
+        num_to_remove: int,
+        attempt: int,
+    ) -> Tuple[List[int], float] | None:
+        removed = set(indices_to_remove)
+        remaining_indices = [idx for idx in current_idxs if idx not in removed]
+
         metric_change = current_value - new_value
         eps_change = self.relative_eps * current_value
         info = f"Try {attempt + 1}. Metric {self.calc_info.metric.name} x algo {self.calc_info.distances.algo.name}. Remove {removal_pct * 100}% ({num_to_remove}). Old {current_value}. New {new_value}. Diff: {metric_change}. relative_eps: {self.relative_eps}. Metric change: {metric_change}. relative_eps*prev_value: {eps_change}.  Is metric changed less than eps: {metric_change <= eps_change}"
@@ -57,11 +144,60 @@ class PctFilter:
             logging.debug(f"Attempt failed. {info}")
             return None
 
+    def remove_idxs_batch(
+        self,
+        current_idxs: List[int],
+        removal_pct: float,
+        current_value: float,
+        num_to_remove: int,
+        rng: random.Random,
+    ) -> Tuple[List[int], float] | None:
+        """
+        Draw all max_tries removals at once, evaluate them with one
+        calc_batch() call and accept the first one that passes.
+        """
+        removals = [
+            rng.sample(current_idxs, num_to_remove) for _ in range(self.max_tries)
+        ]
+
+        # Same texts as value_without_idxs(): all present texts but the removed
+        present_indices = self.calc_info.distances.present_indices()
+        keep_masks = np.zeros(
+            (self.max_tries, int(present_indices.max(initial=-1)) + 1), dtype=bool
+        )
+        keep_masks[:, present_indices] = True
+        for keep_mask, indices_to_remove in zip(keep_masks, removals):
+            keep_mask[indices_to_remove] = False
+
+        start_time = time.time()
+        new_values = self.calc_info.values_for_keep_masks(keep_masks)
+        elapsed_time = time.time() - start_time
+        logging.debug(
+            f"Metric {self.calc_info.metric.name} x algo {self.calc_info.distances.algo.name} calculation of {self.max_tries} attempts took {elapsed_time:.4f} seconds."
+        )
+
+        for attempt, (indices_to_remove, new_value) in enumerate(
+            zip(removals, new_values)
+        ):
+            result = self.check_attempt(
+                current_idxs,
+                indices_to_remove,
+                float(new_value),
+                removal_pct,
+                current_value,
+                num_to_remove,
+                attempt,
+            )
+            if result is not None:
+                return result
+        return None
+
     def try_to_remove_idxs(
         self,
         current_idxs: List[int],
         removal_pct: float,
         current_value: float,
+        rng: random.Random,
     ) -> Tuple[List[int], float, bool]:
         texts_count = len(current_idxs)
         num_to_remove = int(texts_count * removal_pct)
@@ -74,9 +210,19 @@ class PctFilter:
         ):
             return current_idxs, current_value, True
 
+        if self.calc_info.metric.calc_batch is not None:
+            result = self.remove_idxs_batch(
+                current_idxs, removal_pct, current_value, num_to_remove, rng
+            )
+            if result is not None:
+                return result[0], result[1], False
+
+            logging.debug(f"All attempts failed")
+            return current_idxs, current_value, False
+
         for attempt in range(self.max_tries):
             result = self.remove_idxs_attempt(
-                current_idxs, removal_pct, current_value, num_to_remove, attempt
+                current_idxs, removal_pct, current_value, num_to_remove, attempt, rng
             )
             if result is not None:
                 return result[0], result[1], False
@@ -84,6 +230,81 @@ class PctFilter:
         logging.debug(f"All attempts failed")
         return current_idxs, current_value, False
 
+    def speculative_mids(self, left: int, right: int) -> List[int]:
+        """
+        Midpoints the binary search may visit next from (left, right),
+        level by level, at most one per worker.
+        """
+        if self.search_executor == "serial":
+            return [(left + right) // 2]
+
+        mids = []
+        intervals = [(left, right)]
+        while intervals and len(mids) < max(1, self.max_workers):
+            next_intervals = []
+            for interval_left, interval_right in intervals:
+                mid = (interval_left + interval_right) // 2
+                mids.append(mid)
+                if interval_left <= mid - 1:
+                    next_intervals.append((interval_left, mid - 1))
+                if mid + 1 <= interval_right:
+                    next_intervals.append((mid + 1, interval_right))
+            intervals = next_intervals
+        return mids[: max(1, self.max_workers)]
+
+    def evaluate_percentages(
+        self,
+        mids: List[int],
+        initial_indices: List[int],
+        initial_metric_value: float,
+        search_seed: str,
+    ) -> Dict[int, Tuple[List[int], float, bool]]:
+        rng_seeds = [f"{search_seed}:{mid}" for mid in mids]
+        if self.search_executor == "serial":
+            return {
+                mid: self.try_to_remove_idxs(
+                    initial_indices,
+                    mid / 100,
+                    initial_metric_value,
+                    random.Random(rng_seed),
+                )
+                for mid, rng_seed in zip(mids, rng_seeds)
+            }
+
+        if self._executor is None:
+            self._executor = make_executor(self.search_executor, self.max_workers)
+            self.owns_executor = True
+        if not isinstance(self._executor, ProcessPoolExecutor):
+            # Threads share this filter
+            futures = [
+                self._executor.submit(
+                    self.try_to_remove_idxs,
+                    initial_indices,
+                    mid / 100,
+                    initial_metric_value,
+                    random.Random(rng_seed),
+                )
+                for mid, rng_seed in zip(mids, rng_seeds)
+            ]
+            return {mid: future.result() for mid, future in zip(mids, futures)}
+
+        if self._state is None:
+            # Pickled once, worker processes load it on their first task
+            self._state = pickle.dumps(self)
+        futures = [
+            self._executor.submit(
+                _try_to_remove_in_worker,
+                self.token,
+                self._state,
+                initial_indices,
+                mid / 100,
+                initial_metric_value,
+                rng_seed,
+            )
+            for mid, rng_seed in zip(mids, rng_seeds)
+        ]
+        return {mid: future.result() for mid, future in zip(mids, futures)}
+
     def search_for_removal_percentage(
         self,
         initial_indices: List[int],
@@ -96,17 +317,27 @@ class PctFilter:
         tmp_new_indicies = initial_indices
         tmp_new_metric_value = initial_metric_value
 
+        if self.seed is None:
+            search_seed = str(random.getrandbits(64))
+        else:
+            search_seed = f"{self.seed}:{self.iteration}"
+        outcomes = {}
+
         while left <= right:
             mid = (left + right) // 2
-            remove_pct = mid / 100
 
             logging.debug(f"Mid: {mid}. Left: {left}. Right: {right}.")
 
-            new_remaining_indices, new_value, isFinished = self.try_to_remove_idxs(
-                initial_indices,
-                remove_pct,
-                initial_metric_value,
-            )
+            if mid not in outcomes:
+                outcomes.update(
+                    self.evaluate_percentages(
+                        self.speculative_mids(left, right),
+                        initial_indices,
+                        initial_metric_value,
+                        search_seed,
+                    )
+                )
+            new_remaining_indices, new_value, isFinished = outcomes[mid]
 
             if isFinished:
                 logging.debug(f"Break.")
@@ -150,6 +381,7 @@ class PctFilter:
             self.current_metric_value = new_value
         else:
             self.is_finished = True
+            self.close()
 
     def metric_value_without_idxs(self, idxs_to_remove: List[int]) -> float:
         return self.calc_info.value_without_idxs(idxs_to_remove)
@@ -0,0 +1,84 @@
+import os
+import random
+from typing import Dict, List
+
+
+def split_files(file_names: List[str], split_by: int) -> List[List[str]]:
+    """Consecutive chunks of `split_by` files."""
+    return [file_names[i : i + split_by] for i in range(0, len(file_names), split_by)]
+
+
+def file_sizes(file_names: List[str]) -> Dict[str, int]:
+    return {file_name: os.path.getsize(file_name) for file_name in file_names}
+
+
+def balanced_split_files(
+    file_names: List[str],
+    split_by: int,
+    sizes: Dict[str, int],
+    tolerance: float = 0.1,
+    rng: random.Random = random,
+) -> List[List[str]]:
+    """
+    split_files() of the already shuffled `file_names`, followed by swaps
+    of files between the most and the least expensive set until no set
+    costs more than (1 + tolerance) times the mean. The estimated cost of
+    a set is the sum of the length products of all its pairs.
+
+    Set sizes do not change, and a corpus of even file sizes keeps the
+    random chunks as they are. Sets are returned most expensive first, so
+    a pool starts the stragglers first.
+    """
+    sets = split_files(file_names, split_by)
+    # cost = (sum ** 2 - sum of squares) / 2, kept per set for O(1) swaps
+    sums = [sum(sizes[file_name] for file_name in files_set) for files_set in sets]
+    squares = [
+        sum(sizes[file_name] ** 2 for file_name in files_set) for files_set in sets
+    ]
+    costs = [(total * total - square) // 2 for total, square in zip(sums, squares)]
+
+    def swapped_cost(set_idx: int, removed: int, added: int) -> int:
+        total = sums[set_idx] - removed + added
+        square = squares[set_idx] - removed * removed + added * added
+        return (total * total - square) // 2
+
+    for _ in range(len(file_names)):
+        if len(sets) < 2:
+            break
+        heaviest = max(range(len(sets)), key=costs.__getitem__)
+        lightest = min(range(len(sets)), key=costs.__getitem__)
+        if costs[heaviest] <= (1 + tolerance) * sum(costs) / len(costs):
+            break
+
+        # A random file of the heaviest set goes to the lightest set, in
+        # exchange for the file that balances the two sets best
+        heavy_idx = rng.randrange(len(sets[heaviest]))
+        heavy_size = sizes[sets[heaviest][heavy_idx]]
+        best_light_idx = None
+        best_cost = costs[heaviest]
+        for light_idx, light_file in enumerate(sets[lightest]):
+            light_size = sizes[light_file]
+            swap_cost = max(
+                swapped_cost(heaviest, heavy_size, light_size),
+                swapped_cost(lightest, light_size, heavy_size),
+            )
+            if swap_cost < best_cost:
+                best_light_idx = light_idx
+                best_cost = swap_cost
+
+        if best_light_idx is None:
+            continue
+        light_size = sizes[sets[lightest][best_light_idx]]
+        costs[heaviest] = swapped_cost(heaviest, heavy_size, light_size)
+        costs[lightest] = swapped_cost(lightest, light_size, heavy_size)
+        sums[heaviest] += light_size - heavy_size
+        sums[lightest] += heavy_size - light_size
+        squares[heaviest] += light_size**2 - heavy_size**2
+        squares[lightest] += heavy_size**2 - light_size**2
+        sets[heaviest][heavy_idx], sets[lightest][best_light_idx] = (
+            sets[lightest][best_light_idx],
+            sets[heaviest][heavy_idx],
+        )
+
+    order = sorted(range(len(sets)), key=costs.__getitem__, reverse=True)
+    return [sets[idx] for idx in order]
@@ -1,9 +1,10 @@
-from typing import List
+from typing import List, Optional
 import random
 import logging
 
 from texts_diversity.algo import Algo
 from texts_diversity.texts_distances import TextsDistances, build_text_distances
+from texts_diversity.distances_oracle import DistancesOracle
 from texts_diversity.calc_info import CalcInfo
 from texts_diversity.metric import Metric
 from src.pct_filter.pct_filter import PctFilter
@@ -19,6 +20,7 @@ class SetsSplit:
         relative_eps: float = 0.00001,
         max_tries: int = 10,
         min_indices_count: int = 10,
+        oracle: Optional[DistancesOracle] = None,
     ):
         self.current_file_names = all_file_names
         self.split_by = split_by
@@ -27,9 +29,16 @@ class SetsSplit:
         self.relative_eps = relative_eps
         self.max_tries = max_tries
         self.min_indices_count = min_indices_count
+        self.oracle = oracle
 
-    def process_one_set(self, file_paths: List[str]) -> List[str]:
+    def distances_for(self, file_paths: List[str]) -> TextsDistances:
+        if self.oracle is not None:
+            return self.oracle.distances_for(file_paths)
         text_distances, _ = build_text_distances(file_paths, self.algo)
+        return text_distances
+
+    def process_one_set(self, file_paths: List[str]) -> List[str]:
+        text_distances = self.distances_for(file_paths)
         calc_info = CalcInfo(metric=self.metric, algo=self.algo)
         calc_info.distances = text_distances
         initial_indices = list(range(len(file_paths)))
@@ -1,12 +1,25 @@
-from typing import List
+from concurrent.futures import Executor
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+import os
 import random
 import logging
 
 from texts_diversity.algo import Algo
 from texts_diversity.texts_distances import TextsDistances, build_text_distances
+from texts_diversity.distances_oracle import DistancesOracle
 from texts_diversity.calc_info import CalcInfo
 from texts_diversity.metric import Metric
+from texts_diversity.executors import make_executor
 from src.pct_filter.pct_filter import PctFilter
+from src.pct_filter.loo_filter import LooFilter
+from src.sets_split.balanced_split import (
+    balanced_split_files,
+    file_sizes,
+    split_files,
+)
+
+FILTER_MODES = ["pct", "loo"]
 
 
 class SetsSplit2:
@@ -19,6 +32,12 @@ class SetsSplit2:
         relative_eps: float = 0.00001,
         max_tries: int = 10,
         min_indices_count: int = 10,
+        oracle: Optional[DistancesOracle] = None,
+        seed: Optional[int] = None,
+        search_executor: str = "serial",
+        max_workers: int = os.cpu_count(),
+        filter_mode: str = "pct",
+        balance_sets: bool = False,
     ):
         self.current_file_names = all_file_names
         self.split_by = split_by
@@ -27,18 +46,74 @@ class SetsSplit2:
         self.relative_eps = relative_eps
         self.max_tries = max_tries
         self.min_indices_count = min_indices_count
+        self.oracle = oracle
         self.max_metric_value = -1
-
-    def process_one_set(self, calc_info: CalcInfo, file_paths: List[str]) -> List[str]:
+        self.seed = seed
+        self.round = 0
+        self.search_executor = search_executor
+        self.max_workers = max_workers
+        self.filter_mode = filter_mode
+        self.sizes = file_sizes(all_file_names) if balance_sets else None
+        self.pool: Optional[Executor] = None
+
+    def start_pool(self):
+        """
+        Start the removal percentage search workers shared by the filters
+        of all sets and all following rounds.
+        """
+        if self.pool is None and self.search_executor != "serial":
+            self.pool = make_executor(self.search_executor, self.max_workers)
+
+    def stop_pool(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    @contextmanager
+    def worker_pool(self) -> Iterator["SetsSplit2"]:
+        """Keep one worker pool for all filter_files() rounds inside."""
+        self.start_pool()
+        try:
+            yield self
+        finally:
+            self.stop_pool()
+
+    def distances_for(self, file_paths: List[str]) -> TextsDistances:
+        if self.oracle is not None:
+            return self.oracle.distances_for(file_paths)
+        text_distances, _ = build_text_distances(file_paths, self.algo)
+        return text_distances
+
+    def process_one_set(
+        self, calc_info: CalcInfo, file_paths: List[str], set_number: int = 0
+    ) -> List[str]:
         initial_indices = list(range(len(file_paths)))
-        pct_filter = PctFilter(
-            initial_indices=initial_indices,
-            relative_eps=self.relative_eps,
-            max_tries=self.max_tries,
-            min_indices_count=self.min_indices_count,
-            intial_metric_value=self.max_metric_value,
-            calc_info=calc_info,
-        )
+        if self.filter_mode == "loo":
+            pct_filter = LooFilter(
+                initial_indices=initial_indices,
+                relative_eps=self.relative_eps,
+                min_indices_count=self.min_indices_count,
+                intial_metric_value=self.max_metric_value,
+                calc_info=calc_info,
+            )
+        else:
+            pct_filter = PctFilter(
+                initial_indices=initial_indices,
+                relative_eps=self.relative_eps,
+                max_tries=self.max_tries,
+                min_indices_count=self.min_indices_count,
+                intial_metric_value=self.max_metric_value,
+                calc_info=calc_info,
+                # Sets of a round have equal sizes, each needs its own samples
+                seed=(
+                    None
+                    if self.seed is None
+                    else f"{self.seed}:{self.round}:{set_number}"
+                ),
+                search_executor=self.search_executor,
+                max_workers=self.max_workers,
+                executor=self.pool,
+            )
 
         while not pct_filter.is_finished:
             pct_filter.iterate()
@@ -54,22 +129,30 @@ class SetsSplit2:
         return files_to_remove
 
     def filter_files(self) -> bool:
+        if self.pool is None and self.search_executor != "serial":
+            # A pool for this round only
+            with self.worker_pool():
+                return self.filter_files()
+
+        self.round += 1
         finished = False
         old_files_num = len(self.current_file_names)
 
         random.shuffle(self.current_file_names)
 
-        smaller_sets = []
-        for i in range(0, len(self.current_file_names), self.split_by):
-            subset = self.current_file_names[i : i + self.split_by]
-            smaller_sets.append(subset)
+        if self.sizes is not None:
+            smaller_sets = balanced_split_files(
+                self.current_file_names, self.split_by, self.sizes
+            )
+        else:
+            smaller_sets = split_files(self.current_file_names, self.split_by)
 
         logging.info(f"Made substes with lens: {[len(s) for s in smaller_sets]}")
 
         self.max_metric_value = -1
         calc_infos = []
         for file_paths in smaller_sets:
-            text_distances, _ = build_text_distances(file_paths, self.algo)
+            text_distances = self.distances_for(file_paths)
             calc_info = CalcInfo(metric=self.metric, algo=self.algo)
             calc_info.distances = text_distances
             calc_infos.append(calc_info)
@@ -83,7 +166,7 @@ class SetsSplit2:
         for i in range(len(smaller_sets)):
             files_set = smaller_sets[i]
             calc_info = calc_infos[i]
-            files_to_remove = self.process_one_set(calc_info, files_set)
+            files_to_remove = self.process_one_set(calc_info, files_set, i)
 
             for file_to_remove in files_to_remove:
                 if file_to_remove in self.current_file_names:
@@ -1,28 +1,46 @@
 import os
-from typing import List
+from concurrent.futures import Executor, as_completed
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional, Tuple
 import random
 import logging
-from concurrent.futures import ProcessPoolExecutor, as_completed
 
 from texts_diversity.algo import Algo
-from texts_diversity.texts_distances import TextsDistances, build_text_distances
+from texts_diversity.texts_distances import (
+    TextsDistances,
+    build_distances_from_texts,
+)
+from texts_diversity.distances_oracle import DistancesOracle
 from texts_diversity.calc_info import CalcInfo
 from texts_diversity.metric import Metric
+from texts_diversity.executors import make_executor
+from texts_diversity.parallel_distances import fill_distances_parallel
 from src.pct_filter.pct_filter import PctFilter
+from src.sets_split.balanced_split import (
+    balanced_split_files,
+    file_sizes,
+    split_files,
+)
 
+# lazy: subsets compute the pairs they need, eager: all pairs up front
+SHARED_DISTANCES_MODES = ["lazy", "eager"]
 
-def process_one_set(
-    file_paths: List[str],
+
+def filter_one_set(
+    text_distances: TextsDistances,
+    texts_count: int,
     algo: Algo,
     metric: Metric,
     relative_eps: float,
     max_tries: int,
     min_indices_count: int,
-) -> List[str]:
-    text_distances, _ = build_text_distances(file_paths, algo)
+    seed: Optional[int] = None,
+) -> List[int]:
+    """Indices of the texts of `text_distances` that PctFilter removes."""
     calc_info = CalcInfo(metric=metric, algo=algo)
     calc_info.distances = text_distances
-    initial_indices = list(range(len(file_paths)))
+    initial_indices = list(range(texts_count))
     initial_metric_value = calc_info.current_value()
     pct_filter = PctFilter(
         initial_indices=initial_indices,
@@ -31,6 +49,7 @@ def process_one_set(
         min_indices_count=min_indices_count,
         intial_metric_value=initial_metric_value,
         calc_info=calc_info,
+        seed=seed,
     )
 
     while not pct_filter.is_finished:
@@ -40,11 +59,69 @@ def process_one_set(
         f"Initial metric: {initial_metric_value}, filtered metric: {pct_filter.current_metric_value}. Initial files num: {len(initial_indices)}, filtered files num: {len(pct_filter.current_idxs)}"
     )
 
-    missing_indices = [
-        idx for idx in initial_indices if idx not in pct_filter.current_idxs
-    ]
-    files_to_remove = [file_paths[idx] for idx in missing_indices]
-    return files_to_remove
+    remaining = set(pct_filter.current_idxs)
+    return [idx for idx in initial_indices if idx not in remaining]
+
+
+@dataclass
+class MarkWorkerContext:
+    """Everything a worker of the persistent pool needs besides the task."""
+
+    file_paths: List[str]
+    algo: Algo
+    metric: Metric
+    relative_eps: float
+    max_tries: int
+    min_indices_count: int
+    oracle: Optional[DistancesOracle]
+    texts: List[str] = field(default_factory=list)
+
+
+# Set once per worker by _init_mark_worker, so tasks only carry indices
+_worker_context: Optional[MarkWorkerContext] = None
+
+
+def read_texts(file_paths: List[str]) -> List[str]:
+    texts = []
+    for file_path in file_paths:
+        with open(file_path, "r", encoding="utf-8") as f:
+            texts.append(f.read())
+    return texts
+
+
+def _init_mark_worker(context: MarkWorkerContext):
+    global _worker_context
+    if not context.texts:
+        # A worker process loads the corpus once
+        context.texts = read_texts(context.file_paths)
+    _worker_context = context
+
+
+def _process_indices_in_worker(indices: List[int], seed: int) -> Tuple[List[int], int]:
+    """
+    Filter the corpus texts `indices`, returns the removed ones and the
+    count of pairs computed by the oracle.
+    """
+    context = _worker_context
+    texts = [context.texts[idx] for idx in indices]
+    misses = 0
+    if context.oracle is not None:
+        file_paths = [context.file_paths[idx] for idx in indices]
+        misses = context.oracle.fill(file_paths, texts)
+        text_distances = context.oracle.take(file_paths)
+    else:
+        text_distances = build_distances_from_texts(texts, context.algo)
+    removed_indices = filter_one_set(
+        text_distances,
+        len(indices),
+        context.algo,
+        context.metric,
+        context.relative_eps,
+        context.max_tries,
+        context.min_indices_count,
+        seed,
+    )
+    return [indices[idx] for idx in removed_indices], misses
 
 
 class SetsSplitMark:
@@ -58,7 +135,21 @@ class SetsSplitMark:
         max_tries: int = 10,
         min_indices_count: int = 10,
         max_workers: int = os.cpu_count(),
+        executor: str = "process",
+        shared_distances: Optional[str] = None,
+        oracle: Optional[DistancesOracle] = None,
+        balance_sets: bool = False,
     ):
+        """
+        With shared_distances set to one of SHARED_DISTANCES_MODES all
+        rounds use one DistancesOracle of all files instead of computing
+        every subset's distances from scratch. Call close() after the last
+        round to free it. An existing `oracle` can be passed instead, it
+        is not closed by close().
+
+        With balance_sets=True the random sets are balanced by estimated
+        distances cost and the most expensive ones are submitted first.
+        """
         self.current_file_names = all_file_names
         self.split_by = split_by
         self.algo = algo
@@ -67,37 +158,129 @@ class SetsSplitMark:
         self.max_tries = max_tries
         self.min_indices_count = min_indices_count
         self.max_workers = max_workers
+        self.executor = executor
+        self.oracle = oracle
+        self.owns_oracle = False
+        if oracle is None and shared_distances is not None:
+            self.oracle = DistancesOracle(algo=algo, file_paths=all_file_names)
+            self.owns_oracle = True
+        self.shared_distances_mode = shared_distances
+        self.all_file_names = list(all_file_names)
+        self.file_indices = {
+            file_name: idx for idx, file_name in enumerate(self.all_file_names)
+        }
+        self.pool: Optional[Executor] = None
+        self.sizes = file_sizes(self.all_file_names) if balance_sets else None
+
+    def start_pool(self):
+        """
+        Start workers that load the corpus once and serve all following
+        rounds, so tasks carry only lists of text indices. Threads share
+        the context, so the corpus is loaded here before they start and the
+        metric must be safe to call from several threads.
+        """
+        if self.pool is not None:
+            return
+        context = MarkWorkerContext(
+            file_paths=self.all_file_names,
+            algo=self.algo,
+            metric=self.metric,
+            relative_eps=self.relative_eps,
+            max_tries=self.max_tries,
+            min_indices_count=self.min_indices_count,
+            oracle=self.oracle,
+        )
+        if self.executor != "process":
+            context.texts = read_texts(self.all_file_names)
+        self.pool = make_executor(
+            self.executor,
+            max_workers=self.max_workers,
+            initializer=_init_mark_worker,
+            initargs=(context,),
+        )
+
+    def stop_pool(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    @contextmanager
+    def worker_pool(self) -> Iterator["SetsSplitMark"]:
+        """Keep one worker pool for all filter_files() rounds inside."""
+        self.start_pool()
+        try:
+            yield self
+        finally:
+            self.stop_pool()
+
+    def precompute_shared_distances(self):
+        texts = read_texts(self.all_file_names)
+
+        # All pairs are computed once, later rounds are counted as hits
+        self.oracle.record_request(self.all_file_names)
+        missing = self.oracle.store.missing_count()
+        fill_distances_parallel(
+            self.oracle.store,
+            texts,
+            executor=self.executor,
+            max_workers=self.max_workers,
+        )
+        self.oracle.record_misses(missing - self.oracle.store.missing_count())
+        self.shared_distances_mode = "lazy"
+
+    def close(self):
+        self.stop_pool()
+        if self.oracle is not None:
+            self.oracle.log_stats()
+            if self.owns_oracle:
+                self.oracle.close()
+            self.oracle = None
 
     def filter_files(self):
+        if self.shared_distances_mode == "eager":
+            self.precompute_shared_distances()
+
         random.shuffle(self.current_file_names)
 
-        smaller_sets = []
-        for i in range(0, len(self.current_file_names), self.split_by):
-            subset = self.current_file_names[i : i + self.split_by]
-            smaller_sets.append(subset)
+        if self.sizes is not None:
+            smaller_sets = balanced_split_files(
+                self.current_file_names, self.split_by, self.sizes
+            )
+        else:
+            smaller_sets = split_files(self.current_file_names, self.split_by)
 
         logging.info(f"Made substes with lens: {[len(s) for s in smaller_sets]}")
 
+        if self.oracle is not None:
+            for files_set in smaller_sets:
+                self.oracle.record_request(files_set)
+
+        if self.pool is None:
+            # A pool for this round only
+            with self.worker_pool():
+                return self.mark_files(smaller_sets)
+        return self.mark_files(smaller_sets)
+
+    def mark_files(self, smaller_sets: List[List[str]]) -> List[str]:
         all_files_to_remove = []
+        futures = [
+            self.pool.submit(
+                _process_indices_in_worker,
+                [self.file_indices[file_name] for file_name in files_set],
+                # Sampling in workers depends only on the state of `random` in
+                # this process, so rounds are reproducible for any executor
+                random.getrandbits(64),
+            )
+            for files_set in smaller_sets
+        ]
 
-        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
-            futures = [
-                executor.submit(
-                    process_one_set,
-                    files_set,
-                    self.algo,
-                    self.metric,
-                    self.relative_eps,
-                    self.max_tries,
-                    self.min_indices_count,
-                )
-                for files_set in smaller_sets
-            ]
-
-            for future in as_completed(futures):
-                files_to_remove = future.result()
-                all_files_to_remove.extend(files_to_remove)
-                logging.info(f"Marked {len(files_to_remove)} files to remove")
+        for future in as_completed(futures):
+            removed_indices, misses = future.result()
+            if self.oracle is not None:
+                self.oracle.record_misses(misses)
+            files_to_remove = [self.all_file_names[idx] for idx in removed_indices]
+            all_files_to_remove.extend(files_to_remove)
+            logging.info(f"Marked {len(files_to_remove)} files to remove")
 
         logging.info(f"Finished iteration")
 
@@ -1,8 +1,11 @@
 import logging
 from collections import Counter
+from typing import Optional
 
 from src.sets_split.sets_split_mark import SetsSplitMark
-from src.basic.counter_report import CounterReport
+from src.basic.counter_log import open_counter_report
+from src.basic.mark_checkpoint import MarkCheckpoint
+from src.knee.marks_convergence import MarksConvergence
 
 
 class SplitMarkResult:
@@ -11,22 +14,42 @@ class SplitMarkResult:
         sets_split: SetsSplitMark,
         counter_report_file_path: str,
         max_iter: int,
+        convergence: Optional[MarksConvergence] = None,
+        checkpoint: Optional[MarkCheckpoint] = None,
     ):
         self.sets_split = sets_split
         self.max_iter = max_iter
+        self.convergence = convergence
+        self.checkpoint = checkpoint
         self.iter = 0
 
         self.removes_counter = Counter()
         for file_name in sets_split.current_file_names:
             self.removes_counter[file_name] = 0
-        self.counter_report = CounterReport(counter_report_file_path)
+        self.file_names = list(self.removes_counter)
+        self.counter_report = open_counter_report(counter_report_file_path)
         self.counter_report.set_counter(self.removes_counter)
 
-    def process(self):
-        while self.iter < self.max_iter:
-            files_to_remove = self.sets_split.filter_files()
-            self.removes_counter.update(files_to_remove)
+    def process(self, resume: bool = False):
+        """Run the remaining rounds, after the checkpoint when `resume`."""
+        if resume and self.checkpoint and self.checkpoint.exists():
+            self.checkpoint.restore(self)
 
-            self.iter += 1
-            logging.info(f"Finished iteration {self.iter}")
-            self.counter_report.save()
+        # Workers are started once and load the corpus once for all rounds
+        with self.sets_split.worker_pool():
+            while self.iter < self.max_iter:
+                files_to_remove = self.sets_split.filter_files()
+                self.removes_counter.update(files_to_remove)
+
+                self.iter += 1
+                logging.info(f"Finished iteration {self.iter}")
+                self.counter_report.save_round(files_to_remove)
+
+                converged = self.convergence is not None and self.convergence.update(
+                    self.removes_counter, self.file_names
+                )
+                if self.checkpoint:
+                    self.checkpoint.save(self)
+                if converged:
+                    self.convergence.log_saved_rounds(self.max_iter)
+                    break
@@ -1,11 +1,14 @@
 from collections import Counter
 import logging
+from typing import List, Optional
 
 import matplotlib.pyplot as plt
 
 from src.sets_split.sets_split_mark import SetsSplitMark
-from texts_diversity.utils import save_plot_safely
-from src.basic.counter_report import CounterReport
+from texts_diversity.plot_renderer import PlotRenderer, render_plot
+from src.basic.counter_log import open_counter_report
+from src.basic.mark_checkpoint import MarkCheckpoint
+from src.knee.marks_convergence import MarksConvergence
 
 
 class SplitPlots:
@@ -15,52 +18,82 @@ class SplitPlots:
         output_file: str,
         counter_report_file: str,
         max_iter: int,
+        convergence: Optional[MarksConvergence] = None,
+        checkpoint: Optional[MarkCheckpoint] = None,
+        renderer: Optional[PlotRenderer] = None,
     ):
         self.sets_split = sets_split
         self.max_iter = max_iter
+        self.convergence = convergence
+        self.checkpoint = checkpoint
         self.iter = 0
         self.output_file = output_file
+        self.renderer = renderer
 
         self.removes_counter = Counter()
         for file_name in sets_split.current_file_names:
             self.removes_counter[file_name] = 0
-        self.counter_report = CounterReport(counter_report_file)
+        self.file_names = list(self.removes_counter)
+        self.counter_report = open_counter_report(counter_report_file)
         self.counter_report.set_counter(self.removes_counter)
 
-    def draw_all(self):
-        while self.iter < self.max_iter:
-            files_to_remove = self.sets_split.filter_files()
-            self.removes_counter.update(files_to_remove)
+    def draw_all(self, resume: bool = False):
+        """Run the remaining rounds, after the checkpoint when `resume`."""
+        if resume and self.checkpoint and self.checkpoint.exists():
+            self.checkpoint.restore(self)
 
-            self.iter += 1
-            logging.info(f"Finished iteration {self.iter}")
-            self.draw()
-            self.counter_report.save()
+        # Workers are started once and load the corpus once for all rounds
+        with self.sets_split.worker_pool():
+            while self.iter < self.max_iter:
+                files_to_remove = self.sets_split.filter_files()
+                self.removes_counter.update(files_to_remove)
 
-    def draw(self):
-        fig, ax1 = plt.subplots(1, 1, figsize=(25, 12))
+                self.iter += 1
+                logging.info(f"Finished iteration {self.iter}")
+                self.draw()
+                self.counter_report.save_round(files_to_remove)
 
-        all_names = self.sets_split.current_file_names
-        file_indices = list(range(len(all_names)))
-        counts = [self.removes_counter.get(all_names[idx], 0) for idx in file_indices]
+                converged = self.convergence is not None and self.convergence.update(
+                    self.removes_counter, self.file_names
+                )
+                if self.checkpoint:
+                    self.checkpoint.save(self)
+                if converged:
+                    self.convergence.log_saved_rounds(self.max_iter)
+                    break
 
-        sorted_data = sorted(
-            zip(file_indices, counts), key=lambda x: x[1], reverse=True
-        )
-        sorted_indices, sorted_counts = zip(*sorted_data)
-
-        x_positions = list(range(len(sorted_counts)))
-        ax1.bar(x_positions, sorted_counts, width=0.5)
-        ax1.set_xlabel("Files (sorted by count)")
-        ax1.set_ylabel("Times to remove")
-        ax1.set_yticks(range(max(sorted_counts) + 1))
-
-        ax1.set_xticks(x_positions)
-        ax1.set_xticklabels(sorted_indices, rotation=45, ha="right")
-        ax1.tick_params(axis="x", which="major", pad=10)
-        ax1.set_title(
-            f"Times to remove count. Iter {self.iter}. Files: {len(all_names)}. Split by: {self.sets_split.split_by}"
+    def draw(self):
+        all_names = self.sets_split.current_file_names
+        counts = [self.removes_counter.get(name, 0) for name in all_names]
+        render_plot(
+            self.renderer,
+            self.output_file,
+            draw_split_plot,
+            counts,
+            self.iter,
+            self.sets_split.split_by,
         )
 
-        plt.tight_layout(pad=3.0)
-        save_plot_safely(fig, self.output_file)
+
+def draw_split_plot(counts: List[int], iteration: int, split_by: int) -> plt.Figure:
+    fig, ax1 = plt.subplots(1, 1, figsize=(25, 12))
+
+    file_indices = list(range(len(counts)))
+    sorted_data = sorted(zip(file_indices, counts), key=lambda x: x[1], reverse=True)
+    sorted_indices, sorted_counts = zip(*sorted_data)
+
+    x_positions = list(range(len(sorted_counts)))
+    ax1.bar(x_positions, sorted_counts, width=0.5)
+    ax1.set_xlabel("Files (sorted by count)")
+    ax1.set_ylabel("Times to remove")
+    ax1.set_yticks(range(max(sorted_counts) + 1))
+
+    ax1.set_xticks(x_positions)
+    ax1.set_xticklabels(sorted_indices, rotation=45, ha="right")
+    ax1.tick_params(axis="x", which="major", pad=10)
+    ax1.set_title(
+        f"Times to remove count. Iter {iteration}. Files: {len(counts)}. Split by: {split_by}"
+    )
+
+    plt.tight_layout(pad=3.0)
+    return fig
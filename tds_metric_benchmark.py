@@ -0,0 +1,157 @@
+import argparse
+import contextlib
+import io
+import os
+import time
+from typing import Dict, List
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+from texts_diversity.files_list import FilesList
+from texts_diversity.utils import save_plot_safely
+from src.TDSM.TDS_metric import TDSMetric
+from src.TDSM.incremental_TDS_metric import IncrementalTDSMetric
+from src.TDSM.stream_compress_sizes import zlib_stream_compress_algo
+from texts_diversity.executors import EXECUTOR_TYPES
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Compare TDSMetric with IncrementalTDSMetric"
+    )
+    parser.add_argument(
+        "--dir",
+        type=str,
+        default="generated",
+        help="Directory containing input files (default: generated)",
+    )
+    parser.add_argument(
+        "--max-files",
+        type=int,
+        default=50,
+        help="Maximum number of files to process (default: 50)",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.01,
+        help="Allowed relative difference of the metric values (default: 0.01)",
+    )
+    parser.add_argument(
+        "--executor",
+        type=str,
+        choices=EXECUTOR_TYPES,
+        default="serial",
+        help="Executor of the TDSMetric.calc compressions (default: serial)",
+    )
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=os.cpu_count(),
+    )
+    parser.add_argument(
+        "--skip-calc",
+        action="store_true",
+        help="Benchmark only NCD1, TDSMetric.calc is cubic in the files count",
+    )
+    parser.add_argument(
+        "--output-plot",
+        type=str,
+        default="tds_metric_benchmark.svg",
+        help="Path for output plot file (default: tds_metric_benchmark.svg)",
+    )
+    return parser.parse_args()
+
+
+def timed(func, *args):
+    # The metrics print a line per NCD1 call
+    with contextlib.redirect_stdout(io.StringIO()):
+        start_time = time.time()
+        result = func(*args)
+    return result, time.time() - start_time
+
+
+def run_benchmark(
+    texts: List[str],
+    tolerance: float,
+    skip_calc: bool,
+    executor: str,
+    max_workers: int,
+) -> Dict[str, Dict[str, float]]:
+    algo = zlib_stream_compress_algo()
+    metrics = {
+        "TDSMetric": TDSMetric(algo, executor=executor, max_workers=max_workers),
+        "IncrementalTDSMetric": IncrementalTDSMetric(algo),
+    }
+    times = {"NCD1": {}, "calc": {}}
+
+    values = {}
+    for name, metric in metrics.items():
+        values[name], times["NCD1"][name] = timed(metric.NCD1, texts)
+        print(f"[NCD1] {name}: {values[name]:.6f} in {times['NCD1'][name]:.2f} seconds")
+    check_values("NCD1", list(values.values()), tolerance)
+
+    if skip_calc:
+        del times["calc"]
+        return times
+
+    results = {}
+    for name, metric in metrics.items():
+        results[name], times["calc"][name] = timed(metric.calc, texts)
+        print(
+            f"[calc] {name}: {results[name].value:.6f} in {times['calc'][name]:.2f} seconds"
+        )
+    metrics["TDSMetric"].close()
+    check_values("calc", [result.value for result in results.values()], tolerance)
+    if results["IncrementalTDSMetric"].texts != results["TDSMetric"].texts:
+        # Expected for near-tied texts, see IncrementalTDSMetric
+        print("[calc] The metrics removed different texts")
+
+    return times
+
+
+def check_values(stage: str, values: List[float], tolerance: float):
+    reference = values[0]
+    difference = max(abs(value - reference) for value in values) / abs(reference)
+    status = "OK" if difference <= tolerance else "over the tolerance!"
+    print(f"[{stage}] Relative difference {difference:.6f}: {status}")
+
+
+def draw(times: Dict[str, Dict[str, float]], files_count: int, output_plot: str):
+    fig = plt.figure(figsize=(10, 6))
+    stages = list(times)
+    names = list(next(iter(times.values())))
+    width = 0.8 / len(names)
+    for k, name in enumerate(names):
+        plt.bar(
+            np.arange(len(stages)) + k * width,
+            [times[stage][name] for stage in stages],
+            width=width,
+            label=name,
+        )
+    plt.xticks(np.arange(len(stages)) + width * (len(names) - 1) / 2, stages)
+    plt.ylabel("Time (seconds)")
+    plt.title(f"TDS metric for {files_count} files")
+    plt.legend()
+    plt.grid(True, axis="y", alpha=0.3)
+
+    plt.tight_layout()
+    save_plot_safely(fig, output_plot)
+
+
+args = parse_args()
+
+files_list = FilesList(files_dir=args.dir, shuffle=False, max_files=args.max_files)
+texts = []
+for file_path in files_list.file_paths:
+    with open(file_path, "r", encoding="utf-8") as f:
+        texts.append(f.read())
+total_bytes = sum(os.path.getsize(path) for path in files_list.file_paths)
+print(f"{len(texts)} files, mean size {total_bytes / max(1, len(texts)):.0f} bytes")
+
+benchmark_times = run_benchmark(
+    texts, args.tolerance, args.skip_calc, args.executor, args.max_workers
+)
+
+draw(benchmark_times, len(texts), args.output_plot)
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from texts_diversity.condensed_texts_distances import CondensedTextsDistances
+from texts_diversity.texts_distances import TextsDistances
+from src.metrics.incremental_poisson_dist_metric import incremental_poisson_dist_metric
+
+TEXTS_COUNT = 30
+
+
+def grown_distances(distances: TextsDistances, metric) -> TextsDistances:
+    rng = np.random.default_rng(0)
+    for to_idx in range(1, TEXTS_COUNT):
+        distances.set_row(to_idx, rng.random(to_idx))
+        assert metric.calc_grown(distances) == pytest.approx(metric.calc(distances))
+    return distances
+
+
+@pytest.fixture(params=["dict", "condensed"])
+def make_distances(request):
+    if request.param == "dict":
+        return lambda: TextsDistances(algo=None)
+    return lambda: CondensedTextsDistances(algo=None)
+
+
+def test_grown_after_removal(make_distances):
+    metric = incremental_poisson_dist_metric()
+    distances = grown_distances(make_distances(), metric)
+
+    distances.remove_list([3])
+    assert metric.calc_grown(distances) == pytest.approx(metric.calc(distances))
+
+
+def test_grown_of_views(make_distances):
+    metric = incremental_poisson_dist_metric()
+    distances = grown_distances(make_distances(), metric)
+
+    for view in (
+        distances.without([7]),
+        distances.subset(np.arange(TEXTS_COUNT) % 3 != 0),
+        distances.subset(np.arange(TEXTS_COUNT) < 10),
+    ):
+        assert metric.calc_grown(view) == pytest.approx(metric.calc(view))
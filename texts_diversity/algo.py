@@ -1,5 +1,7 @@
 from dataclasses import dataclass
-from typing import Callable
+from typing import Any, Callable, List, Optional
+
+import numpy as np
 
 
 @dataclass
@@ -7,6 +9,8 @@ class Algo:
     name: str
     func: Callable[[str, str], float]
     color: str
+    # Optional vectorized func: distances from a text to a list of texts
+    batch_func: Optional[Callable[[str, List[str]], np.ndarray]] = None
 
 
 @dataclass
@@ -14,3 +18,18 @@ class CompressAlgo:
     name: str
     func: Callable[[str], bytes]
     color: str
+
+
+@dataclass
+class StreamCompressAlgo(CompressAlgo):
+    # Factory of a streaming compressor that supports copy(), e.g. zlib.compressobj
+    compressobj: Optional[Callable[[], Any]] = None
+    # Bytes of history the compressor refers back to, None if unbounded
+    window: Optional[int] = None
+
+
+def clear_algo_cache(algo: Algo):
+    """Call clear() of the distance object behind algo.func, if it has one."""
+    clear = getattr(getattr(algo.func, "__self__", None), "clear", None)
+    if clear is not None:
+        clear()
@@ -0,0 +1,111 @@
+import bz2
+import lzma
+import zlib
+from typing import Callable, Dict, List, Optional
+
+
+def lzma_size(data: bytes) -> int:
+    # Same as textdistance.LZMANCD: the 14-byte container header is not counted
+    return len(lzma.compress(data)) - 14
+
+
+def zlib_size(data: bytes) -> int:
+    # Same as textdistance.ZLIBNCD: the 2-byte zlib header is not counted
+    return len(zlib.compress(data)) - 2
+
+
+def bz2_size(data: bytes) -> int:
+    # Same as textdistance.BZ2NCD: the 15-byte stream header is not counted
+    return len(bz2.compress(data)) - 15
+
+
+class CachedNCD:
+    """
+    Normalized compression distance that compresses every text alone only
+    once. Texts are encoded to bytes once and C(x) is cached per text.
+    The caches are keyed by content, so the builders of distance matrices
+    clear() them when a matrix is done (see clear_algo_cache) and long
+    lived workers do not keep every text they have seen.
+
+    With `both_orders=True` the value is the same as textdistance NCD
+    (min of C(ab) and C(ba)). With `both_orders=False` only C(ab) is
+    computed, so one pair costs a single compression.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        compressed_size: Callable[[bytes], int],
+        both_orders: bool = True,
+    ):
+        self.name = name
+        self.compressed_size = compressed_size
+        self.both_orders = both_orders
+        self.encoded: Dict[str, bytes] = {}
+        self.sizes: Dict[str, int] = {}
+
+    @property
+    def cache_variant(self) -> Optional[str]:
+        """Tells cached values of the variants apart, None for the default."""
+        return None if self.both_orders else "one_order"
+
+    def __getstate__(self):
+        # Do not ship the cache to worker processes
+        state = self.__dict__.copy()
+        state["encoded"] = {}
+        state["sizes"] = {}
+        return state
+
+    def prepare(self, texts: List[str]):
+        """Encode and compress the given texts ahead of pair computations."""
+        for text in texts:
+            self.text_size(text)
+
+    def encode(self, text: str) -> bytes:
+        encoded = self.encoded.get(text)
+        if encoded is None:
+            encoded = text.encode("utf-8")
+            self.encoded[text] = encoded
+        return encoded
+
+    def text_size(self, text: str) -> int:
+        size = self.sizes.get(text)
+        if size is None:
+            size = self.compressed_size(self.encode(text))
+            self.sizes[text] = size
+        return size
+
+    def concat_size(self, a: str, b: str) -> int:
+        encoded_a = self.encode(a)
+        encoded_b = self.encode(b)
+        size = self.compressed_size(encoded_a + encoded_b)
+        if self.both_orders:
+            size = min(size, self.compressed_size(encoded_b + encoded_a))
+        return size
+
+    def distance(self, a: str, b: str) -> float:
+        size_a = self.text_size(a)
+        size_b = self.text_size(b)
+        max_size = max(size_a, size_b)
+        if max_size == 0:
+            return 0
+        return (self.concat_size(a, b) - min(size_a, size_b)) / max_size
+
+    def clear(self):
+        self.encoded.clear()
+        self.sizes.clear()
+
+
+class CachedLZMANCD(CachedNCD):
+    def __init__(self, both_orders: bool = True):
+        super().__init__("LZMANCD", lzma_size, both_orders)
+
+
+class CachedZLIBNCD(CachedNCD):
+    def __init__(self, both_orders: bool = True):
+        super().__init__("ZLIBNCD", zlib_size, both_orders)
+
+
+class CachedBZ2NCD(CachedNCD):
+    def __init__(self, both_orders: bool = True):
+        super().__init__("BZ2NCD", bz2_size, both_orders)
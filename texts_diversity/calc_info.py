@@ -1,15 +1,21 @@
 from dataclasses import dataclass
 from typing import Callable, List
 
+import numpy as np
+
 from texts_diversity.texts_distances import TextsDistances
+from texts_diversity.condensed_texts_distances import CondensedTextsDistances
 from texts_diversity.metric import Metric
 from texts_diversity.algo import Algo
 
 
 class CalcInfo:
-    def __init__(self, metric: Metric, algo: Algo):
+    def __init__(self, metric: Metric, algo: Algo, dense: bool = False):
         self.metric = metric
-        self.distances = TextsDistances(algo=algo)
+        if dense:
+            self.distances = CondensedTextsDistances(algo=algo)
+        else:
+            self.distances = TextsDistances(algo=algo)
 
     def label(self) -> str:
         return f"{self.metric.name} ({self.distances.algo.name})"
@@ -17,10 +23,26 @@ class CalcInfo:
     def current_value(self) -> float:
         return self.metric.calc(self.distances)
 
+    def grown_value(self) -> float:
+        """current_value() after texts were only added since the last call."""
+        if self.metric.calc_grown is not None:
+            return self.metric.calc_grown(self.distances)
+        return self.metric.calc(self.distances)
+
     def value(self, distances: TextsDistances) -> float:  # TODO: remove. Deprecated.
         return self.metric.calc(distances)
 
     def value_without_idxs(self, idxs_to_remove: List[int]) -> float:
-        distances_copy = self.distances.copy()
-        distances_copy.remove_list(idxs_to_remove)
-        return self.metric.calc(distances_copy)
+        if self.metric.calc_without is not None:
+            return self.metric.calc_without(self.distances, idxs_to_remove)
+        return self.metric.calc(self.distances.without(idxs_to_remove))
+
+    def values_for_keep_masks(self, keep_masks: np.ndarray) -> np.ndarray:
+        """Metric value of the texts selected by every row of `keep_masks`."""
+        keep_masks = np.asarray(keep_masks, dtype=bool)
+        if self.metric.calc_batch is not None:
+            return self.metric.calc_batch(self.distances, keep_masks)
+        return np.array(
+            [self.metric.calc(self.distances.subset(mask)) for mask in keep_masks],
+            dtype=np.float64,
+        )
@@ -0,0 +1,91 @@
+from typing import Callable, Iterable, Tuple
+
+import numpy as np
+
+# Returns a fresh iterator over the value chunks on every call
+ChunksFactory = Callable[[], Iterable[np.ndarray]]
+
+
+def chunked_sum_count(chunks: ChunksFactory) -> Tuple[float, int, int]:
+    """Sum and count of non-NaN values and the number of NaN values."""
+    total = 0.0
+    count = 0
+    nan_count = 0
+    for chunk in chunks():
+        nans = np.isnan(chunk)
+        nan_count += int(nans.sum())
+        count += len(chunk) - int(nans.sum())
+        total += float(chunk[~nans].sum(dtype=np.float64))
+    return total, count, nan_count
+
+
+def _range_mask(chunk: np.ndarray, low: float, high: float) -> np.ndarray:
+    return (chunk >= low) & (chunk <= high)
+
+
+def kth_value(
+    chunks: ChunksFactory,
+    k: int,
+    bins: int = 4096,
+    max_in_memory: int = 2**22,
+) -> float:
+    """
+    Exact k-th smallest (0-based) non-NaN value of a stream that does not
+    fit in memory. The value range is narrowed with histograms until the
+    values left in it fit in `max_in_memory`.
+    """
+    low, high = -np.inf, np.inf
+    while True:
+        count = 0
+        range_min, range_max = np.inf, -np.inf
+        for chunk in chunks():
+            in_range = chunk[_range_mask(chunk, low, high)]
+            count += len(in_range)
+            if len(in_range):
+                range_min = min(range_min, float(in_range.min()))
+                range_max = max(range_max, float(in_range.max()))
+
+        if count <= max_in_memory or range_min == range_max:
+            break
+
+        edges = np.linspace(range_min, range_max, bins + 1)
+        histogram = np.zeros(bins, dtype=np.int64)
+        for chunk in chunks():
+            in_range = chunk[_range_mask(chunk, low, high)]
+            histogram += np.histogram(in_range, bins=edges)[0]
+
+        cumulative = np.cumsum(histogram)
+        bin_idx = int(np.searchsorted(cumulative, k, side="right"))
+        k -= int(cumulative[bin_idx - 1]) if bin_idx > 0 else 0
+        # np.histogram bins are [a, b) except the last one, which is [a, b]
+        new_low = edges[bin_idx]
+        new_high = edges[bin_idx + 1]
+        if bin_idx < bins - 1:
+            new_high = np.nextafter(new_high, -np.inf)
+        low, high = new_low, new_high
+
+    if range_min == range_max:
+        return range_min
+
+    values = np.concatenate(
+        [chunk[_range_mask(chunk, low, high)] for chunk in chunks()]
+    )
+    return float(np.partition(values, k)[k])
+
+
+def select_ranks(chunks: ChunksFactory, start: int, end: int) -> np.ndarray:
+    """
+    Sorted non-NaN values with ranks start..end-1 (0-based, ascending) of
+    a stream, keeping only about end - start values in memory.
+    """
+    low = kth_value(chunks, start)
+    high = kth_value(chunks, end - 1)
+
+    below = 0
+    selected = []
+    for chunk in chunks():
+        below += int((chunk < low).sum())
+        selected.append(chunk[_range_mask(chunk, low, high)])
+
+    values = np.sort(np.concatenate(selected))
+    return values[start - below : end - below]
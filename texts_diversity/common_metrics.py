@@ -1,13 +1,27 @@
 import numpy as np
 
 from texts_diversity.texts_distances import TextsDistances
+from texts_diversity.chunked_values import chunked_sum_count, select_ranks
 
 
 def calc_mean_metric(distances: TextsDistances) -> float:
+    if distances.chunk_size is not None:
+        total, count, nan_count = chunked_sum_count(distances.iter_value_chunks)
+        return float("nan") if nan_count or not count else total / count
+
     values = distances.get_normalized_values()
-    return float(np.array(values).mean())
+    return float(np.mean(values))
 
 
 def calc_median_metric(distances: TextsDistances) -> float:
+    if distances.chunk_size is not None:
+        _, count, nan_count = chunked_sum_count(distances.iter_value_chunks)
+        if nan_count or not count:
+            return float("nan")
+        middle = select_ranks(
+            distances.iter_value_chunks, (count - 1) // 2, count // 2 + 1
+        )
+        return float(np.mean(middle))
+
     values = distances.get_normalized_values()
     return float(np.median(values))
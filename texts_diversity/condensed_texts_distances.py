@@ -0,0 +1,190 @@
+from typing import Iterator, List, Optional, Callable, Tuple
+
+import numpy as np
+
+from texts_diversity.algo import Algo
+from texts_diversity.texts_distances import TextsDistances
+
+
+def condensed_size(texts_count: int) -> int:
+    """Number of pairs between `texts_count` texts."""
+    return texts_count * (texts_count - 1) // 2
+
+
+def condensed_index(from_idx: int, to_idx: int) -> int:
+    """
+    Position of the pair in the condensed buffer.
+    Pairs are stored row by row: (0, 1), (0, 2), (1, 2), (0, 3), ...
+    so the row of text j starts at j * (j - 1) / 2 and does not depend on
+    the total number of texts.
+    """
+    i, j = min(from_idx, to_idx), max(from_idx, to_idx)
+    return j * (j - 1) // 2 + i
+
+
+def condensed_position_chunks(
+    indices: np.ndarray, chunk_size: int
+) -> Iterator[np.ndarray]:
+    """
+    condensed_positions(indices) in ascending chunks of whole rows, at
+    most chunk_size positions each unless a single row is longer.
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    # Row k holds the k pairs of indices[k] with indices[:k]
+    row_ends = np.cumsum(np.arange(len(indices), dtype=np.int64))
+    start_row = 1
+    while start_row < len(indices):
+        done = row_ends[start_row - 1]
+        end_row = int(np.searchsorted(row_ends, done + chunk_size, side="right"))
+        end_row = max(end_row, start_row + 1)
+        rows = np.arange(start_row, end_row)
+        j = np.repeat(indices[rows], rows)
+        i = indices[np.arange(len(j)) - np.repeat(row_ends[rows - 1] - done, rows)]
+        yield j * (j - 1) // 2 + i
+        start_row = end_row
+
+
+def condensed_positions(indices: np.ndarray) -> np.ndarray:
+    """Buffer positions of all pairs between the given sorted text indices."""
+    rows, cols = np.tril_indices(len(indices), -1)
+    j = indices[rows].astype(np.int64)
+    i = indices[cols].astype(np.int64)
+    return j * (j - 1) // 2 + i
+
+
+class CondensedTextsDistances(TextsDistances):
+    """
+    TextsDistances stored in a preallocated lower-triangular NumPy buffer
+    instead of a dict of tuple keys. Values are kept in the same order as
+    the dict backend inserts them.
+    """
+
+    def __init__(
+        self,
+        algo: Algo,
+        normalize: Optional[Callable[[List[float]], List[float]]] = None,
+        capacity: int = 0,
+        dtype: np.dtype = np.float64,
+    ):
+        super().__init__(algo=algo, normalize=normalize)
+        self.dtype = np.dtype(dtype)
+        self.texts_count = 0
+        self.buffer = np.full(condensed_size(capacity), np.nan, dtype=self.dtype)
+        self.present = np.ones(capacity, dtype=bool)
+
+    @property
+    def capacity(self) -> int:
+        return len(self.present)
+
+    def _ensure_capacity(self, texts_count: int):
+        if texts_count <= self.capacity:
+            return
+
+        new_capacity = max(texts_count, 2 * self.capacity)
+        buffer = np.full(condensed_size(new_capacity), np.nan, dtype=self.dtype)
+        buffer[: len(self.buffer)] = self.buffer
+        present = np.ones(new_capacity, dtype=bool)
+        present[: self.capacity] = self.present
+
+        self.buffer = buffer
+        self.present = present
+
+    def reserve(self, texts_count: int):
+        self._ensure_capacity(texts_count)
+
+    def set_distance(self, from_idx: int, to_idx: int, value: float):
+        texts_count = max(from_idx, to_idx) + 1
+        self._ensure_capacity(texts_count)
+        self.buffer[condensed_index(from_idx, to_idx)] = value
+        self.texts_count = max(self.texts_count, texts_count)
+
+    def set_row(self, to_idx: int, values: np.ndarray, from_idx: int = 0):
+        self._ensure_capacity(to_idx + 1)
+        start = condensed_size(to_idx) + from_idx
+        self.buffer[start : start + len(values)] = values
+        self.texts_count = max(self.texts_count, to_idx + 1)
+
+    def present_indices(self) -> np.ndarray:
+        return np.flatnonzero(self.present[: self.texts_count])
+
+    def max_key(self) -> int:
+        indices = self.present_indices()
+        if len(indices) < 2:
+            raise ValueError("max_key() of distances without pairs")
+        return int(indices[-1])
+
+    def distance(self, from_idx: int, to_idx: int) -> float:
+        """Get distance between two texts by their indices."""
+        if (
+            from_idx == to_idx
+            or min(from_idx, to_idx) < 0
+            or max(from_idx, to_idx) >= self.texts_count
+            or not self.present[from_idx]
+            or not self.present[to_idx]
+        ):
+            raise ValueError(f"Distance ({from_idx}, {to_idx}) does not exist")
+        return float(self.buffer[condensed_index(from_idx, to_idx)])
+
+    def values_for_indices(self, indices: np.ndarray) -> np.ndarray:
+        if len(indices) == self.texts_count:
+            values = self.buffer[: condensed_size(self.texts_count)].view()
+            values.setflags(write=False)
+            return values
+        return self.buffer[condensed_positions(indices)]
+
+    def pair_values(
+        self, from_indices: np.ndarray, to_indices: np.ndarray
+    ) -> np.ndarray:
+        from_indices = np.asarray(from_indices, dtype=np.int64)
+        to_indices = np.asarray(to_indices, dtype=np.int64)
+        i = np.minimum(from_indices, to_indices)
+        j = np.maximum(from_indices, to_indices)
+        return np.asarray(self.buffer[j * (j - 1) // 2 + i], dtype=np.float64)
+
+    def pairs_count(self) -> int:
+        texts_count = int(self.present[: self.texts_count].sum())
+        return texts_count * (texts_count - 1) // 2
+
+    def pairs(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        indices = self.present_indices()
+        rows, cols = np.tril_indices(len(indices), -1)
+        values = np.asarray(self.values_for_indices(indices), dtype=np.float64)
+        return indices[cols], indices[rows], values
+
+    def take(self, indices: List[int]) -> "CondensedTextsDistances":
+        """
+        New distances of texts `indices` renumbered 0, 1, ... in the given
+        order, with the values copied out of this matrix.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        rows, cols = np.tril_indices(len(indices), -1)
+        new_distances = CondensedTextsDistances(
+            self.algo, self.normalize, capacity=0, dtype=self.dtype
+        )
+        new_distances.texts_count = len(indices)
+        new_distances.buffer = self.pair_values(indices[cols], indices[rows]).astype(
+            self.dtype
+        )
+        new_distances.present = np.ones(len(indices), dtype=bool)
+        return new_distances
+
+    def get_normalized_values(self) -> np.ndarray:
+        values = self.values_for_indices(self.present_indices())
+        if self.normalize:
+            return np.asarray(self.normalize(values), dtype=np.float64)
+        return values
+
+    def copy(self):
+        new_distances = CondensedTextsDistances(
+            self.algo, self.normalize, capacity=0, dtype=self.dtype
+        )
+        new_distances.texts_count = self.texts_count
+        new_distances.buffer = self.buffer[: condensed_size(self.texts_count)].copy()
+        new_distances.present = self.present[: self.texts_count].copy()
+        return new_distances
+
+    def remove_list(self, text_ids: List[int]):
+        text_ids = np.asarray(text_ids, dtype=np.int64)
+        text_ids = text_ids[(text_ids >= 0) & (text_ids < self.texts_count)]
+        self.present[text_ids] = False
+        self.removals += 1
@@ -0,0 +1,268 @@
+import hashlib
+import logging
+import math
+import os
+import sqlite3
+import threading
+import uuid
+from multiprocessing.util import Finalize
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from texts_diversity.algo import Algo, clear_algo_cache
+
+
+class DistancesCache:
+    """
+    Persistent SQLite cache of pairwise distances keyed by
+    (algo name, content hash of text A, content hash of text B).
+    The algo name must identify the distance function: two algos with the
+    same name share cached values. Distance objects with a `cache_variant`
+    (CachedNCD) add it to the key.
+
+    Hit and miss counters are stored in the database per run, so that
+    counts from worker processes are included in stats(). They are
+    counted in memory and written with the next stored row, every
+    `stats_batch` lookups and when the process exits, so rows that are
+    all hits do not take the write lock.
+
+    Every process and thread opens its own connection, so one cache can be
+    used from worker pools of any kind.
+    """
+
+    stats_batch = 10000
+
+    def __init__(self, path: str, run_id: Optional[str] = None):
+        self.path = path
+        self.run_id = run_id or uuid.uuid4().hex
+        self.hashes: Dict[str, bytes] = {}
+        self.reset_process_state()
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO stats (run_id, hits, misses) VALUES (?, 0, 0)",
+                (self.run_id,),
+            )
+
+    def reset_process_state(self):
+        self.pid = os.getpid()
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.pending_hits = 0
+        self.pending_misses = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["hashes"] = {}
+        for name in ("pid", "local", "lock", "pending_hits", "pending_misses"):
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.reset_process_state()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self.pid != os.getpid():
+            # A forked worker: the counters of the parent are not ours
+            self.reset_process_state()
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=600)
+            self.local.connection = connection
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS distances ("
+                "algo TEXT, text_a BLOB, text_b BLOB, value REAL, "
+                "PRIMARY KEY (algo, text_a, text_b)) WITHOUT ROWID"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS distances_text_b "
+                "ON distances (algo, text_b)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS stats ("
+                "run_id TEXT PRIMARY KEY, hits INTEGER, misses INTEGER)"
+            )
+            if threading.current_thread() is threading.main_thread():
+                # Worker processes exit without atexit handlers
+                Finalize(self, self.flush_stats, exitpriority=10)
+        return connection
+
+    def text_hash(self, text: str) -> bytes:
+        text_hash = self.hashes.get(text)
+        if text_hash is None:
+            text_hash = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+            self.hashes[text] = text_hash
+        return text_hash
+
+    def pair_key(
+        self, hash_a: bytes, hash_b: bytes, symmetric: bool
+    ) -> Tuple[bytes, bytes]:
+        if symmetric and hash_b < hash_a:
+            return hash_b, hash_a
+        return hash_a, hash_b
+
+    def get_row(
+        self, algo_name: str, text: str, others: List[str], symmetric: bool
+    ) -> List[Optional[float]]:
+        """Cached distances from `text` to every text in `others` (None if missing)."""
+        text_hash = self.text_hash(text)
+        known = {
+            other_hash: value
+            for other_hash, value in self.connection.execute(
+                "SELECT text_b, value FROM distances WHERE algo = ? AND text_a = ?",
+                (algo_name, text_hash),
+            )
+        }
+        if symmetric:
+            known.update(
+                self.connection.execute(
+                    "SELECT text_a, value FROM distances WHERE algo = ? AND text_b = ?",
+                    (algo_name, text_hash),
+                )
+            )
+        return [known.get(self.text_hash(other)) for other in others]
+
+    def put_row(
+        self,
+        algo_name: str,
+        text: str,
+        others: List[str],
+        values: List[float],
+        hits: int,
+        symmetric: bool,
+    ):
+        """Store computed distances (NaN values are not cached) and counters."""
+        text_hash = self.text_hash(text)
+        rows = []
+        for other, value in zip(others, values):
+            if math.isnan(value):
+                continue
+            hash_a, hash_b = self.pair_key(text_hash, self.text_hash(other), symmetric)
+            rows.append((algo_name, hash_a, hash_b, value))
+
+        connection = self.connection
+        with self.lock:
+            self.pending_hits += hits
+            self.pending_misses += len(others)
+            batch_full = self.pending_hits + self.pending_misses >= self.stats_batch
+        if rows:
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO distances (algo, text_a, text_b, value) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                self.write_stats(connection)
+        elif batch_full:
+            self.flush_stats()
+
+    def write_stats(self, connection: sqlite3.Connection):
+        with self.lock:
+            hits, misses = self.pending_hits, self.pending_misses
+            self.pending_hits = 0
+            self.pending_misses = 0
+        if hits or misses:
+            connection.execute(
+                "UPDATE stats SET hits = hits + ?, misses = misses + ? WHERE run_id = ?",
+                (hits, misses, self.run_id),
+            )
+
+    def flush_stats(self):
+        """Write the counters of this process to the database."""
+        connection = self.connection
+        if self.pending_hits or self.pending_misses:
+            with connection:
+                self.write_stats(connection)
+
+    def stats(self) -> Tuple[int, int]:
+        """(hits, misses) of this run across all processes."""
+        self.flush_stats()
+        row = self.connection.execute(
+            "SELECT hits, misses FROM stats WHERE run_id = ?", (self.run_id,)
+        ).fetchone()
+        return (row[0], row[1]) if row else (0, 0)
+
+    def log_stats(self):
+        hits, misses = self.stats()
+        total = hits + misses
+        hit_rate = hits / total * 100 if total else 0.0
+        logging.info(
+            f"Distances cache {self.path}: {hits} hits, {misses} misses ({hit_rate:.1f}% hit rate)"
+        )
+
+    def wrap(self, algo: Algo, symmetric: bool = True) -> Algo:
+        """
+        Algo with the same name and color that reads distances from the
+        cache and computes only missing pairs with `algo`. Use
+        symmetric=False for algos where distance(a, b) != distance(b, a).
+        """
+        cached = CachedAlgo(self, algo, symmetric, algo_cache_key(algo))
+        return Algo(
+            name=algo.name,
+            func=cached.distance,
+            color=algo.color,
+            batch_func=cached.distances_to,
+        )
+
+
+def algo_cache_key(algo: Algo) -> str:
+    """Algo name, with the cache_variant of the distance object if it has one."""
+    variant = getattr(getattr(algo.func, "__self__", None), "cache_variant", None)
+    return algo.name if variant is None else f"{algo.name}:{variant}"
+
+
+class CachedAlgo:
+    def __init__(
+        self,
+        cache: DistancesCache,
+        algo: Algo,
+        symmetric: bool,
+        key: Optional[str] = None,
+    ):
+        self.cache = cache
+        self.algo = algo
+        self.symmetric = symmetric
+        self.key = key or algo.name
+
+    def distance(self, a: str, b: str) -> float:
+        return float(self.distances_to(a, [b])[0])
+
+    def clear(self):
+        clear_algo_cache(self.algo)
+
+    def distances_to(self, text: str, others: List[str]) -> np.ndarray:
+        cached_values = self.cache.get_row(self.key, text, others, self.symmetric)
+        values = np.array(
+            [np.nan if value is None else value for value in cached_values],
+            dtype=np.float64,
+        )
+
+        missing = [idx for idx, value in enumerate(cached_values) if value is None]
+        missing_texts = [others[idx] for idx in missing]
+        if missing:
+            if self.algo.batch_func is not None:
+                missing_values = np.asarray(
+                    self.algo.batch_func(text, missing_texts), dtype=np.float64
+                )
+            else:
+                missing_values = np.array(
+                    [self.algo.func(text, other) for other in missing_texts],
+                    dtype=np.float64,
+                )
+            values[missing] = missing_values
+        else:
+            missing_values = []
+
+        self.cache.put_row(
+            self.key,
+            text,
+            missing_texts,
+            list(missing_values),
+            hits=len(others) - len(missing),
+            symmetric=self.symmetric,
+        )
+        return values
@@ -0,0 +1,77 @@
+import logging
+from typing import List, Optional, Tuple
+
+from texts_diversity.algo import Algo
+from texts_diversity.condensed_texts_distances import (
+    CondensedTextsDistances,
+    condensed_size,
+)
+from texts_diversity.shared_texts_distances import SharedTextsDistances
+
+
+class DistancesOracle:
+    """
+    Lazy memoized distances between the files of a fixed corpus, for the
+    SetsSplit family. A pair is computed the first time a subset asks for
+    it and served from a SharedTextsDistances store afterwards, also to
+    worker processes (pickling sends only the shared memory name).
+
+    Requested pairs and computed pairs (misses) are counted in the process
+    that calls record_request() and record_misses(). Workers get the
+    count of the pairs they computed from fill(), and the caller records
+    it, so values restored into the store are not counted as misses.
+    """
+
+    def __init__(self, algo: Algo, file_paths: List[str]):
+        self.store = SharedTextsDistances(algo=algo, capacity=len(file_paths))
+        self.file_indices = {file_path: idx for idx, file_path in enumerate(file_paths)}
+        self.requested_pairs = 0
+        self.misses = 0
+
+    def indices_of(self, file_paths: List[str]) -> List[int]:
+        return [self.file_indices[file_path] for file_path in file_paths]
+
+    def record_request(self, file_paths: List[str]):
+        self.requested_pairs += condensed_size(len(file_paths))
+
+    def record_misses(self, count: int):
+        self.misses += count
+
+    def fill(self, file_paths: List[str], texts: Optional[List[str]] = None) -> int:
+        """Compute the missing pairs of `file_paths`, returns their count."""
+        return self.store.fill_missing(self.indices_of(file_paths), file_paths, texts)
+
+    def distances_for(
+        self,
+        file_paths: List[str],
+        texts: Optional[List[str]] = None,
+    ) -> CondensedTextsDistances:
+        """
+        Distances between `file_paths` numbered 0, 1, ... in the given
+        order, like build_text_distances(file_paths, algo) returns them.
+        Pass the texts of the files when they are already loaded. Workers
+        call fill() and take() instead, so the caller records the request
+        and the misses.
+        """
+        self.record_request(file_paths)
+        self.record_misses(self.fill(file_paths, texts))
+        return self.take(file_paths)
+
+    def take(self, file_paths: List[str]) -> CondensedTextsDistances:
+        return self.store.take(self.indices_of(file_paths))
+
+    def stats(self) -> Tuple[int, int]:
+        """(hits, misses) of the recorded requests."""
+        return max(0, self.requested_pairs - self.misses), self.misses
+
+    def log_stats(self):
+        hits, misses = self.stats()
+        total = hits + misses
+        hit_rate = hits / total * 100 if total else 0.0
+        logging.info(
+            f"Distances oracle: {hits} hits, {misses} misses ({hit_rate:.1f}% hit rate)"
+        )
+
+    def close(self):
+        """Free the shared memory. Only the creating process may call it."""
+        self.store.unlink()
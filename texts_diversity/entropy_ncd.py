@@ -0,0 +1,153 @@
+import math
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+from scipy.special import xlogy
+
+
+class HistogramEntropyNCD:
+    """
+    EntropyNCD (same as textdistance.EntropyNCD) computed from per-text
+    symbol histograms. The entropy of a concatenation only depends on the
+    sum of both histograms, so a pair never touches the texts themselves
+    and whole rows or blocks of the distance matrix are computed with
+    array operations.
+    """
+
+    def __init__(self, coef: int = 1, base: int = 2):
+        self.coef = coef
+        self.base = base
+        self.symbols: Dict[int, int] = {}
+        self.rows: Dict[str, int] = {}
+        self.histograms = np.zeros((0, 0), dtype=np.float64)
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        # Do not ship the histograms to worker processes
+        state = self.__dict__.copy()
+        state["symbols"] = {}
+        state["rows"] = {}
+        state["histograms"] = np.zeros((0, 0), dtype=np.float64)
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def _grow(self, rows: int, cols: int):
+        old_rows, old_cols = self.histograms.shape
+        if rows <= old_rows and cols <= old_cols:
+            return
+        histograms = np.zeros(
+            (max(rows, 2 * old_rows), max(cols, 2 * old_cols)), dtype=np.float64
+        )
+        histograms[:old_rows, :old_cols] = self.histograms
+        self.histograms = histograms
+
+    def row_of(self, text: str) -> int:
+        """Row of the text histogram, built on first use."""
+        row = self.rows.get(text)
+        if row is not None:
+            return row
+
+        with self.lock:
+            return self._add_row(text)
+
+    def _add_row(self, text: str) -> int:
+        row = self.rows.get(text)
+        if row is not None:
+            return row
+
+        code_points = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        code_points, counts = np.unique(code_points, return_counts=True)
+        for code_point in code_points.tolist():
+            if code_point not in self.symbols:
+                self.symbols[code_point] = len(self.symbols)
+        cols = np.array(
+            [self.symbols[code_point] for code_point in code_points.tolist()],
+            dtype=np.int64,
+        )
+
+        row = len(self.rows)
+        self._grow(row + 1, len(self.symbols))
+        self.histograms[row, cols] = counts
+        self.rows[text] = row
+        return row
+
+    def rows_of(self, texts: List[str]) -> np.ndarray:
+        return np.array([self.row_of(text) for text in texts], dtype=np.int64)
+
+    def snapshot(self) -> np.ndarray:
+        """
+        Histograms of all known texts over all known symbols. Safe to use
+        while other threads add texts: the array is replaced, not resized.
+        """
+        histograms = self.histograms
+        return histograms[:, : min(len(self.symbols), histograms.shape[1])]
+
+    def sizes(self, counts: np.ndarray) -> np.ndarray:
+        """coef + entropy for every histogram along the last axis."""
+        totals = counts.sum(axis=-1)
+        safe_totals = np.where(totals > 0, totals, 1)
+        entropy = np.log(safe_totals) - xlogy(counts, counts).sum(axis=-1) / safe_totals
+        entropy = np.maximum(entropy, 0) / math.log(self.base)
+        return self.coef + np.where(totals > 0, entropy, 0)
+
+    def _ncd(
+        self, concat_sizes: np.ndarray, sizes_a: np.ndarray, sizes_b: np.ndarray
+    ) -> np.ndarray:
+        max_sizes = np.maximum(sizes_a, sizes_b)
+        safe_max_sizes = np.where(max_sizes == 0, 1, max_sizes)
+        values = (concat_sizes - np.minimum(sizes_a, sizes_b)) / safe_max_sizes
+        return np.where(max_sizes == 0, 0, values)
+
+    def distance(self, a: str, b: str) -> float:
+        return float(self.distances_to(a, [b])[0])
+
+    def distances_to(self, text: str, others: List[str]) -> np.ndarray:
+        """Distances from `text` to every text in `others`."""
+        row = self.row_of(text)
+        other_rows = self.rows_of(others)
+        all_histograms = self.snapshot()
+        histogram = all_histograms[row]
+        other_histograms = all_histograms[other_rows]
+
+        return self._ncd(
+            self.sizes(other_histograms + histogram),
+            self.sizes(histogram),
+            self.sizes(other_histograms),
+        )
+
+    def pairwise(
+        self,
+        texts: List[str],
+        other_texts: Optional[List[str]] = None,
+        block_elements: int = 2**24,
+    ) -> np.ndarray:
+        """
+        Distance matrix between `texts` and `other_texts` (or `texts` itself).
+        Rows are processed in blocks of at most `block_elements` summed
+        histogram cells to bound memory usage.
+        """
+        rows = self.rows_of(texts)
+        other_rows = rows if other_texts is None else self.rows_of(other_texts)
+        all_histograms = self.snapshot()
+        cols = all_histograms.shape[1]
+        histograms = all_histograms[rows]
+        other_histograms = all_histograms[other_rows]
+        sizes = self.sizes(histograms)
+        other_sizes = self.sizes(other_histograms)
+
+        block_size = max(1, block_elements // max(1, len(other_rows) * cols))
+        result = np.empty((len(rows), len(other_rows)), dtype=np.float64)
+        for start in range(0, len(rows), block_size):
+            end = min(start + block_size, len(rows))
+            concat_sizes = self.sizes(
+                histograms[start:end, None, :] + other_histograms[None, :, :]
+            )
+            result[start:end] = self._ncd(
+                concat_sizes, sizes[start:end, None], other_sizes[None, :]
+            )
+        return result
@@ -0,0 +1,52 @@
+import os
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from typing import Callable, Tuple
+
+EXECUTOR_TYPES = ["serial", "thread", "process"]
+
+
+class SerialExecutor(Executor):
+    """Runs every task in the calling thread at submit time."""
+
+    def __init__(self, initializer: Callable = None, initargs: Tuple = ()):
+        if initializer is not None:
+            initializer(*initargs)
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
+def make_executor(
+    executor_type: str,
+    max_workers: int = os.cpu_count(),
+    initializer: Callable = None,
+    initargs: Tuple = (),
+) -> Executor:
+    """
+    "process" pays pickling of the task arguments but runs Python code in
+    parallel. "thread" avoids pickling and is parallel only while the work
+    releases the GIL (lzma, zlib, bz2, numpy). "serial" runs in place.
+    """
+    if executor_type == "process":
+        return ProcessPoolExecutor(
+            max_workers=max_workers, initializer=initializer, initargs=initargs
+        )
+    if executor_type == "thread":
+        return ThreadPoolExecutor(
+            max_workers=max_workers, initializer=initializer, initargs=initargs
+        )
+    if executor_type == "serial":
+        return SerialExecutor(initializer=initializer, initargs=initargs)
+    raise ValueError(
+        f"Unknown executor type {executor_type}. Expected one of {EXECUTOR_TYPES}"
+    )
@@ -22,3 +22,7 @@ class IterativeMetric(ABC):
         Calculate the metric value for the given texts.
         """
         pass
+
+    def close(self):
+        """Free what calc() keeps between calls, e.g. a worker pool."""
+        pass
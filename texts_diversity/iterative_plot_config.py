@@ -1,8 +1,8 @@
-from typing import List
+from typing import List, Optional
 import matplotlib.pyplot as plt
 
 from texts_diversity.plot import Plot
-from texts_diversity.utils import save_plot_safely
+from texts_diversity.plot_renderer import PlotRenderer, render_plot
 from texts_diversity.iterative_metric import IterativeMetric
 
 
@@ -13,38 +13,53 @@ class IterativePlotConfig:
         texts: List[str],
         metric: IterativeMetric,
         output_file: str,
+        renderer: Optional[PlotRenderer] = None,
     ):
         self.name = name
         self.texts = texts
         self.metric = metric
         self.output_file = output_file
         self.y_values = []
+        self.renderer = renderer
 
     def execute(self):
         finish = False
-        while not finish:
-            result = self.metric.calc(self.texts)
-            self.texts = result.texts
-            finish = result.finished
-            self.y_values.append(result.value)
-            self.draw()
+        try:
+            while not finish:
+                result = self.metric.calc(self.texts)
+                self.texts = result.texts
+                finish = result.finished
+                self.y_values.append(result.value)
+                self.draw()
+        finally:
+            self.metric.close()
 
     def draw(self):
         if not self.y_values:
             return
 
-        x_values = list(range(len(self.y_values)))
-
-        fig, ax = plt.subplots(1, 1, figsize=(10, 6))
-        series = {self.metric.name: self.y_values}
-        plot = Plot(
-            ax=ax,
-            x_values=x_values,
-            x_name="Iteration",
-            series=series,
-            y_name=self.metric.name,
-            title=self.name,
+        render_plot(
+            self.renderer,
+            self.output_file,
+            draw_iterative_plot,
+            self.name,
+            self.metric.name,
+            list(self.y_values),
         )
-        plot.draw()
 
-        save_plot_safely(fig, self.output_file)
+
+def draw_iterative_plot(name: str, metric_name: str, y_values: List[float]):
+    x_values = list(range(len(y_values)))
+
+    fig, ax = plt.subplots(1, 1, figsize=(10, 6))
+    series = {metric_name: y_values}
+    plot = Plot(
+        ax=ax,
+        x_values=x_values,
+        x_name="Iteration",
+        series=series,
+        y_name=metric_name,
+        title=name,
+    )
+    plot.draw()
+    return fig
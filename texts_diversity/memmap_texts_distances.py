@@ -0,0 +1,122 @@
+import copy
+import json
+import os
+from typing import Callable, Iterator, List, Optional
+
+import numpy as np
+
+from texts_diversity.algo import Algo
+from texts_diversity.condensed_texts_distances import (
+    CondensedTextsDistances,
+    condensed_position_chunks,
+    condensed_size,
+)
+
+
+class MemmapTextsDistances(CondensedTextsDistances):
+    """
+    CondensedTextsDistances with the buffer in a numpy.memmap file, for
+    corpora whose distance matrix does not fit in RAM. The number of texts
+    and the dtype are kept in a `<path>.json` file next to the matrix, so
+    a matrix can be reopened (e.g. read-only by several experiment
+    processes sharing one page cache) with MemmapTextsDistances.open().
+
+    Metrics stream over the values in chunks of `chunk_size` values. Pairs
+    that were never set read as 0 (the file is not prefilled).
+    """
+
+    def __init__(
+        self,
+        algo: Algo,
+        path: str,
+        capacity: int,
+        normalize: Optional[Callable[[List[float]], List[float]]] = None,
+        dtype: np.dtype = np.float32,
+        mode: str = "w+",
+        chunk_size: int = 2**24,
+    ):
+        super().__init__(algo=algo, normalize=normalize, capacity=0, dtype=dtype)
+        self.path = path
+        self.mode = mode
+        self.chunk_size = chunk_size
+        # A memmap can not be empty, so at least one value is allocated
+        self.buffer = np.memmap(
+            path,
+            dtype=self.dtype,
+            mode=mode,
+            shape=(max(1, condensed_size(capacity)),),
+        )
+        self.present = np.ones(capacity, dtype=bool)
+
+    @staticmethod
+    def metadata_path(path: str) -> str:
+        return f"{path}.json"
+
+    @classmethod
+    def open(
+        cls,
+        algo: Algo,
+        path: str,
+        mode: str = "r",
+        normalize: Optional[Callable[[List[float]], List[float]]] = None,
+        chunk_size: int = 2**24,
+    ) -> "MemmapTextsDistances":
+        """Reopen a matrix written earlier. mode="r" shares it read-only."""
+        with open(cls.metadata_path(path), "r") as f:
+            metadata = json.load(f)
+
+        distances = cls(
+            algo=algo,
+            path=path,
+            capacity=metadata["capacity"],
+            normalize=normalize,
+            dtype=np.dtype(metadata["dtype"]),
+            mode=mode,
+            chunk_size=chunk_size,
+        )
+        distances.texts_count = metadata["texts_count"]
+        return distances
+
+    def flush(self):
+        """Write pending pages and the metadata to disk."""
+        self.buffer.flush()
+        with open(self.metadata_path(self.path), "w") as f:
+            json.dump(
+                {
+                    "capacity": self.capacity,
+                    "texts_count": self.texts_count,
+                    "dtype": self.dtype.str,
+                    "algo": self.algo.name,
+                },
+                f,
+            )
+
+    def _ensure_capacity(self, texts_count: int):
+        if texts_count > self.capacity:
+            raise ValueError(
+                f"Memmap distances {self.path} are allocated for {self.capacity} texts, got {texts_count}"
+            )
+
+    def copy(self):
+        # The matrix file is shared, only the set of present texts is copied
+        new_distances = copy.copy(self)
+        new_distances.present = self.present.copy()
+        return new_distances
+
+    def iter_value_chunks(self) -> Iterator[np.ndarray]:
+        if self.normalize:
+            yield from super().iter_value_chunks()
+            return
+        yield from self.iter_values_for_indices(self.present_indices())
+
+    def iter_values_for_indices(self, indices: np.ndarray) -> Iterator[np.ndarray]:
+        if len(indices) != self.texts_count:
+            # Absent texts: gather the pairs of the others row block by row block
+            for positions in condensed_position_chunks(indices, self.chunk_size):
+                yield np.asarray(self.buffer[positions], dtype=np.float64)
+            return
+
+        size = condensed_size(self.texts_count)
+        for start in range(0, size, self.chunk_size):
+            end = min(start + self.chunk_size, size)
+            yield np.asarray(self.buffer[start:end], dtype=np.float64)
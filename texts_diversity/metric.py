@@ -1,5 +1,7 @@
 from dataclasses import dataclass
-from typing import Callable
+from typing import Callable, List, Optional
+
+import numpy as np
 
 from texts_diversity.texts_distances import TextsDistances
 
@@ -8,3 +10,11 @@ from texts_diversity.texts_distances import TextsDistances
 class Metric:
     name: str
     calc: Callable[[TextsDistances], float]
+    # Optional faster way to get calc(distances.without(idxs))
+    calc_without: Optional[Callable[[TextsDistances, List[int]], float]] = None
+    # Optional vectorized calc(distances.subset(mask)) for every row of a
+    # 2-D boolean keep-mask matrix (candidates x texts)
+    calc_batch: Optional[Callable[[TextsDistances, np.ndarray], np.ndarray]] = None
+    # Optional faster calc(distances) for distances that only gained texts
+    # (add_dist) since the previous call
+    calc_grown: Optional[Callable[[TextsDistances], float]] = None
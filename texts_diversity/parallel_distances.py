@@ -0,0 +1,97 @@
+import os
+import time
+import logging
+from concurrent.futures import as_completed
+from typing import List, Tuple
+
+import numpy as np
+
+from texts_diversity.algo import Algo, clear_algo_cache
+from texts_diversity.executors import make_executor
+from texts_diversity.texts_distances import TextsDistances, compute_distances
+
+# Set once per worker process by _init_worker, so tasks only carry tile bounds
+_worker_texts: List[str] = []
+_worker_algo: Algo = None
+
+Tile = Tuple[int, int, int, int]
+TileRow = Tuple[int, int, np.ndarray]
+
+
+def _init_worker(texts: List[str], algo: Algo):
+    global _worker_texts, _worker_algo
+    _worker_texts = texts
+    _worker_algo = algo
+
+
+def compute_tile(
+    texts: List[str], algo: Algo, tile: Tuple[int, int, int, int]
+) -> List[TileRow]:
+    from_start, from_end, to_start, to_end = tile
+    rows = []
+    for to_idx in range(to_start, to_end):
+        row_end = min(from_end, to_idx)
+        if row_end <= from_start:
+            continue
+        values = compute_distances(
+            algo, texts[to_idx], texts[from_start:row_end], to_idx, from_start
+        )
+        rows.append((to_idx, from_start, values))
+    return rows
+
+
+def _compute_tile_in_worker(tile: Tile) -> List[TileRow]:
+    return compute_tile(_worker_texts, _worker_algo, tile)
+
+
+def upper_triangle_tiles(texts_count: int, tile_size: int) -> List[Tile]:
+    """
+    Tiles (from_start, from_end, to_start, to_end) covering every pair
+    (i, j) with i < j exactly once. Largest tiles come first.
+    """
+    tiles = []
+    for to_start in range(0, texts_count, tile_size):
+        to_end = min(to_start + tile_size, texts_count)
+        for from_start in range(0, to_start + 1, tile_size):
+            from_end = min(from_start + tile_size, texts_count)
+            tiles.append((from_start, from_end, to_start, to_end))
+    tiles.sort(key=lambda t: (t[1] - t[0]) * (t[3] - t[2]), reverse=True)
+    return tiles
+
+
+def fill_distances_parallel(
+    distances: TextsDistances,
+    texts: List[str],
+    executor: str = "process",
+    max_workers: int = os.cpu_count(),
+    tile_size: int = 32,
+):
+    """
+    Compute all pairwise distances between `texts` on a pool of the given
+    executor type (see make_executor) and write them into `distances`.
+    Every worker receives the texts once; tasks only carry tile bounds.
+    The values are the same as filling `distances` with add_dist text by
+    text.
+    """
+    start_time = time.time()
+    tiles = upper_triangle_tiles(len(texts), tile_size)
+    distances.reserve(len(texts))
+
+    with make_executor(
+        executor,
+        max_workers=max_workers,
+        initializer=_init_worker,
+        initargs=(texts, distances.algo),
+    ) as pool:
+        futures = [pool.submit(_compute_tile_in_worker, tile) for tile in tiles]
+
+        for future in as_completed(futures):
+            for to_idx, from_idx, values in future.result():
+                distances.set_row(to_idx, values, from_idx=from_idx)
+    # Serial and thread workers used the caller's algo
+    clear_algo_cache(distances.algo)
+
+    elapsed_time = time.time() - start_time
+    logging.debug(
+        f"Algo {distances.algo.name}. Computed distances between {len(texts)} texts in {len(tiles)} tiles ({executor}) in {elapsed_time:.4f}s"
+    )
@@ -0,0 +1,154 @@
+import logging
+import multiprocessing
+import pickle
+import queue
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import matplotlib.pyplot as plt
+
+from texts_diversity.utils import save_plot_safely
+
+# Figures looked up by registered_figure(), by name. In the renderer
+# process they are the unpickled copies sent once by
+# PlotRenderer.add_figure(), render_here() adds its own ones while it draws.
+_figures: Dict[str, plt.Figure] = {}
+
+
+def registered_figure(name: str) -> plt.Figure:
+    return _figures[name]
+
+
+def _render(output_file: str, draw: Callable[..., plt.Figure], args: tuple):
+    try:
+        save_plot_safely(draw(*args), output_file)
+    except Exception:
+        # A broken plot must not stop the other plots
+        logging.exception(f"Failed to render {output_file}")
+
+
+def _render_loop(requests: multiprocessing.Queue, interval: float):
+    pending = {}
+    last_render = {}
+    closing = False
+    while not closing:
+        timeout = None
+        if pending:
+            next_render = min(
+                last_render.get(output_file, float("-inf")) + interval
+                for output_file in pending
+            )
+            timeout = max(0.0, next_render - time.monotonic())
+
+        try:
+            request = requests.get(timeout=timeout)
+            while True:
+                if request is None:
+                    closing = True
+                else:
+                    request = pickle.loads(request)
+                    if request[0] == "figure":
+                        _, name, fig = request
+                        _figures[name] = fig
+                    else:
+                        # Only the latest request of a plot is rendered
+                        _, output_file, draw, args = request
+                        pending[output_file] = (draw, args)
+                request = requests.get_nowait()
+        except queue.Empty:
+            pass
+
+        now = time.monotonic()
+        for output_file, (draw, args) in list(pending.items()):
+            if closing or now - last_render.get(output_file, float("-inf")) >= interval:
+                _render(output_file, draw, args)
+                last_render[output_file] = time.monotonic()
+                del pending[output_file]
+
+
+class PlotRenderer:
+    """
+    Renders plots in a separate process, so compute loops do not wait for
+    matplotlib. render() queues a request and returns at once: the
+    renderer process calls draw(*args) and saves the returned figure.
+
+    Requests for the same output file are coalesced, only the latest one
+    is rendered, and a file is rendered at most once per `interval`
+    seconds. close() renders all pending requests before it returns.
+
+    `draw` must be a module-level function and `args` plain data, both
+    are pickled. Figures with a layout built by the caller are sent once
+    with add_figure() and looked up by draw with registered_figure().
+
+    The latest request of every file is kept here as well. If the
+    renderer process dies, close() logs it and renders them in this
+    process, and render_here() draws them on the caller's figures.
+    """
+
+    def __init__(self, interval: float = 5.0):
+        self.interval = interval
+        self.latest: Dict[str, Tuple[Callable[..., plt.Figure], tuple]] = {}
+        # The caller's figures, for render_here()
+        self.figures: Dict[str, plt.Figure] = {}
+        self.requests = multiprocessing.Queue()
+        self.process = multiprocessing.Process(
+            target=_render_loop, args=(self.requests, interval), daemon=True
+        )
+        self.process.start()
+
+    def put(self, request: tuple):
+        # Pickled here, the queue would drop a request that fails to
+        # pickle in its feeder thread
+        self.requests.put(pickle.dumps(request))
+
+    def add_figure(self, name: str, fig: plt.Figure):
+        self.figures[name] = fig
+        self.put(("figure", name, fig))
+
+    def render(self, output_file: str, draw: Callable[..., plt.Figure], *args):
+        self.put(("plot", output_file, draw, args))
+        self.latest[output_file] = (draw, args)
+
+    def render_here(self, output_file: str):
+        """Render the latest request of `output_file` in this process."""
+        if output_file in self.latest:
+            draw, args = self.latest[output_file]
+            _figures.update(self.figures)
+            try:
+                _render(output_file, draw, args)
+            finally:
+                for name in self.figures:
+                    _figures.pop(name, None)
+
+    def close(self):
+        if self.process.is_alive():
+            self.requests.put(None)
+        self.process.join()
+        if self.process.exitcode != 0:
+            # Nobody reads the requests left in the queue
+            self.requests.cancel_join_thread()
+            logging.error(
+                f"Plot renderer exited with code {self.process.exitcode}, rendering {len(self.latest)} plots in this process"
+            )
+            for output_file in self.latest:
+                self.render_here(output_file)
+        self.requests.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def render_plot(
+    renderer: Optional[PlotRenderer],
+    output_file: str,
+    draw: Callable[..., plt.Figure],
+    *args,
+):
+    """Render with `renderer`, or draw and save right away without one."""
+    if renderer is None:
+        save_plot_safely(draw(*args), output_file)
+    else:
+        renderer.render(output_file, draw, *args)
@@ -1,12 +1,19 @@
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
 from texts_diversity.plot_config import PlotConfig
 from texts_diversity.plot import Plot
+from texts_diversity.plot_renderer import PlotRenderer, registered_figure
 from texts_diversity.utils import save_plot_safely
 
 
 class PlotsList:
-    def __init__(self, configs: List[PlotConfig], output_file: str, fig):
+    def __init__(
+        self,
+        configs: List[PlotConfig],
+        output_file: str,
+        fig,
+        renderer: Optional[PlotRenderer] = None,
+    ):
         self.configs = configs
         self.x_values = []
         self.y_values = {
@@ -15,6 +22,8 @@ class PlotsList:
         }
         self.output_file = output_file
         self.fig = fig
+        self.renderer = renderer
+        self.figure_added = False
 
     def add_x_value(self, x_value: int):
         self.x_values.append(x_value)
@@ -22,49 +31,77 @@ class PlotsList:
     def add_y_values(self):
         for plot_config in self.configs:
             for calc_info in plot_config.calc_infos:
-                y_value = calc_info.metric.calc(calc_info.distances)
+                # Texts are only appended between calls
+                y_value = calc_info.grown_value()
                 print(
                     f"Metric {calc_info.metric.name}. Algo: {calc_info.distances.algo.name}. Value: {y_value}. For {self.x_values[-1]} texts"
                 )
                 self.y_values[plot_config][calc_info].append(y_value)
 
     def draw(self):
-        fig = self.fig
-
+        axes_plots = []
         for plot_config in self.configs:
             # Group series by axis to avoid overriding
             axis_series = {}
             axis_series_colors = {}
 
             for idx, calc_info in enumerate(plot_config.calc_infos):
-                ax = plot_config.axes[idx]
-                ax_id = id(ax)
+                ax_idx = self.fig.axes.index(plot_config.axes[idx])
 
-                if ax_id not in axis_series:
-                    axis_series[ax_id] = {}
-                    axis_series_colors[ax_id] = {}
+                if ax_idx not in axis_series:
+                    axis_series[ax_idx] = {}
+                    axis_series_colors[ax_idx] = {}
 
                 label = f"{calc_info.metric.name} ({calc_info.distances.algo.name})"
-                axis_series[ax_id][label] = self.y_values[plot_config][calc_info]
-                axis_series_colors[ax_id][label] = calc_info.distances.algo.color
-
-            for ax_id, series in axis_series.items():
-                ax = None
-                for idx, calc_info in enumerate(plot_config.calc_infos):
-                    if id(plot_config.axes[idx]) == ax_id:
-                        ax = plot_config.axes[idx]
-                        break
-
-                if ax is not None:
-                    plot = Plot(
-                        ax=ax,
-                        x_values=self.x_values,
-                        x_name="Number of files",
-                        series=series,
-                        y_name="Metric values",
-                        title=plot_config.name,
-                        series_colors=axis_series_colors[ax_id],
-                    )
-                    plot.draw()
-
-        save_plot_safely(fig, self.output_file)
+                axis_series[ax_idx][label] = list(self.y_values[plot_config][calc_info])
+                axis_series_colors[ax_idx][label] = calc_info.distances.algo.color
+
+            for ax_idx, series in axis_series.items():
+                axes_plots.append(
+                    (ax_idx, plot_config.name, series, axis_series_colors[ax_idx])
+                )
+
+        if self.renderer is None:
+            save_plot_safely(
+                draw_axes_plots(self.fig, self.x_values, axes_plots), self.output_file
+            )
+            return
+
+        if not self.figure_added:
+            self.renderer.add_figure(self.output_file, self.fig)
+            self.figure_added = True
+        self.renderer.render(
+            self.output_file,
+            draw_plots_list,
+            self.output_file,
+            list(self.x_values),
+            axes_plots,
+        )
+
+
+def draw_plots_list(
+    figure_name: str,
+    x_values: List[int],
+    axes_plots: List[Tuple[int, str, Dict[str, List[float]], Dict[str, str]]],
+):
+    """Draw (axis index, title, series, colors) plots on a registered figure."""
+    return draw_axes_plots(registered_figure(figure_name), x_values, axes_plots)
+
+
+def draw_axes_plots(
+    fig,
+    x_values: List[int],
+    axes_plots: List[Tuple[int, str, Dict[str, List[float]], Dict[str, str]]],
+):
+    for ax_idx, title, series, series_colors in axes_plots:
+        plot = Plot(
+            ax=fig.axes[ax_idx],
+            x_values=x_values,
+            x_name="Number of files",
+            series=series,
+            y_name="Metric values",
+            title=title,
+            series_colors=series_colors,
+        )
+        plot.draw()
+    return fig
@@ -0,0 +1,169 @@
+from multiprocessing import shared_memory
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from texts_diversity.algo import Algo, clear_algo_cache
+from texts_diversity.condensed_texts_distances import (
+    CondensedTextsDistances,
+    condensed_index,
+    condensed_size,
+)
+from texts_diversity.texts_distances import compute_distances
+
+
+class SharedTextsDistances(CondensedTextsDistances):
+    """
+    CondensedTextsDistances of a fixed set of texts with the buffer in
+    multiprocessing.shared_memory. Pickling sends only the segment name,
+    so worker processes attach to the same matrix instead of copying it.
+
+    A shared mask of one byte per pair marks the computed pairs, NaN
+    values are left to the pairs whose distance failed. fill_missing()
+    computes the rest for a subset of texts, so the matrix is filled
+    lazily by the subsets that need it. Processes may fill disjoint
+    subsets concurrently.
+
+    The process that created the matrix must call unlink() when done.
+    """
+
+    def __init__(
+        self,
+        algo: Algo,
+        capacity: int,
+        normalize: Optional[Callable[[List[float]], List[float]]] = None,
+        name: Optional[str] = None,
+    ):
+        super().__init__(algo=algo, normalize=normalize, capacity=0)
+        create = name is None
+        # A shared memory segment can not be empty
+        self.shm = shared_memory.SharedMemory(
+            name=name,
+            create=create,
+            size=max(1, condensed_size(capacity)) * self.dtype.itemsize,
+        )
+        self.buffer = np.ndarray(
+            (condensed_size(capacity),), dtype=self.dtype, buffer=self.shm.buf
+        )
+        self.computed_shm = shared_memory.SharedMemory(
+            name=f"{self.shm.name}_computed",
+            create=create,
+            size=max(1, condensed_size(capacity)),
+        )
+        self.computed = np.ndarray(
+            (condensed_size(capacity),), dtype=bool, buffer=self.computed_shm.buf
+        )
+        if create:
+            self.buffer.fill(np.nan)
+            self.computed.fill(False)
+        self.present = np.ones(capacity, dtype=bool)
+        self.texts_count = capacity
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["shm"]
+        del state["buffer"]
+        del state["computed_shm"]
+        del state["computed"]
+        state["shm_name"] = self.shm.name
+        state["computed_shm_name"] = self.computed_shm.name
+        return state
+
+    def __setstate__(self, state):
+        shm_name = state.pop("shm_name")
+        computed_shm_name = state.pop("computed_shm_name")
+        self.__dict__.update(state)
+        self.shm = shared_memory.SharedMemory(name=shm_name)
+        self.buffer = np.ndarray(
+            (condensed_size(self.capacity),), dtype=self.dtype, buffer=self.shm.buf
+        )
+        self.computed_shm = shared_memory.SharedMemory(name=computed_shm_name)
+        self.computed = np.ndarray(
+            (condensed_size(self.capacity),),
+            dtype=bool,
+            buffer=self.computed_shm.buf,
+        )
+
+    def _ensure_capacity(self, texts_count: int):
+        if texts_count > self.capacity:
+            raise ValueError(
+                f"Shared distances are allocated for {self.capacity} texts, got {texts_count}"
+            )
+
+    def set_distance(self, from_idx: int, to_idx: int, value: float):
+        super().set_distance(from_idx, to_idx, value)
+        self.computed[condensed_index(from_idx, to_idx)] = True
+
+    def set_row(self, to_idx: int, values: np.ndarray, from_idx: int = 0):
+        super().set_row(to_idx, values, from_idx=from_idx)
+        start = condensed_size(to_idx) + from_idx
+        self.computed[start : start + len(values)] = True
+
+    def missing_count(self) -> int:
+        """Number of pairs that were not computed yet."""
+        return int(len(self.computed) - np.count_nonzero(self.computed))
+
+    def copy(self):
+        # Texts are removed by marking them absent, the matrix stays shared
+        new_distances = CondensedTextsDistances(
+            self.algo, self.normalize, capacity=0, dtype=self.dtype
+        )
+        new_distances.texts_count = self.texts_count
+        new_distances.buffer = self.buffer
+        new_distances.present = self.present.copy()
+        return new_distances
+
+    def fill_missing(
+        self,
+        indices: List[int],
+        file_paths: List[str],
+        texts: Optional[List[str]] = None,
+    ) -> int:
+        """
+        Compute the not yet computed pairs between texts `indices`, where
+        file_paths[k] is the file of text indices[k]. Only files that take
+        part in a missing pair are read, unless the texts are given.
+        Returns the number of computed pairs.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        rows, cols = np.tril_indices(len(indices), -1)
+        i = np.minimum(indices[cols], indices[rows])
+        j = np.maximum(indices[cols], indices[rows])
+        missing = ~self.computed[j * (j - 1) // 2 + i]
+        if not missing.any():
+            return 0
+
+        loaded_texts = dict(enumerate(texts)) if texts is not None else {}
+
+        def text(k: int) -> str:
+            if k not in loaded_texts:
+                with open(file_paths[k], "r", encoding="utf-8") as f:
+                    loaded_texts[k] = f.read()
+            return loaded_texts[k]
+
+        missing_rows, missing_cols = rows[missing], cols[missing]
+        for row in np.unique(missing_rows):
+            row_cols = missing_cols[missing_rows == row]
+            values = compute_distances(
+                self.algo,
+                text(row),
+                [text(col) for col in row_cols],
+                to_idx=int(indices[row]),
+            )
+            i = np.minimum(indices[row_cols], indices[row])
+            j = np.maximum(indices[row_cols], indices[row])
+            self.buffer[j * (j - 1) // 2 + i] = values
+            self.computed[j * (j - 1) // 2 + i] = True
+        clear_algo_cache(self.algo)
+        return int(missing.sum())
+
+    def close(self):
+        self.buffer = None
+        self.computed = None
+        self.shm.close()
+        self.computed_shm.close()
+
+    def unlink(self):
+        self.close()
+        self.shm.unlink()
+        self.computed_shm.unlink()
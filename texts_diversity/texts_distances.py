@@ -1,11 +1,44 @@
-from typing import List, Dict, Tuple, Optional, Callable, Union
+from typing import List, Dict, Tuple, Optional, Callable, Union, Iterator
 import logging
+import os
 import time
 
-from texts_diversity.algo import Algo
+import numpy as np
+
+from texts_diversity.algo import Algo, clear_algo_cache
+
+
+def compute_distances(
+    algo: Algo, new_text: str, old_texts: List[str], to_idx: int, from_idx: int = 0
+) -> np.ndarray:
+    """
+    Distances from `old_texts` (texts from_idx, from_idx+1, ...) to
+    `new_text` (text `to_idx`). Uses algo.batch_func when available and
+    falls back to algo.func pair by pair. Failed pairs get NaN.
+    """
+    if algo.batch_func is not None and old_texts:
+        try:
+            return np.asarray(algo.batch_func(new_text, old_texts), dtype=np.float64)
+        except Exception as e:
+            print(f"Error calculating distances for text {to_idx}: {e}")
+
+    values = np.empty(len(old_texts), dtype=np.float64)
+    for offset, prev_text in enumerate(old_texts):
+        try:
+            values[offset] = algo.func(new_text, prev_text)
+        except Exception as e:
+            print(
+                f"Error calculating distance for pair ({from_idx + offset}, {to_idx}): {e}"
+            )
+            values[offset] = float("nan")
+    return values
 
 
 class TextsDistances:
+    # Number of values per chunk for backends that metrics should stream
+    # over with iter_value_chunks(). None means all values fit in memory.
+    chunk_size: Optional[int] = None
+
     def __init__(
         self,
         algo: Algo,
@@ -14,6 +47,8 @@ class TextsDistances:
         self.algo = algo
         self.data: Dict[Tuple[int, int], Optional[float]] = {}
         self.normalize = normalize
+        # Calls of remove_list(), so incremental metrics notice removals
+        self.removals = 0
 
     def add_dist(self, old_texts: List[str], new_text: str):
         """
@@ -22,21 +57,31 @@ class TextsDistances:
         current_idx = len(old_texts)
 
         start_time = time.time()
-        for prev_idx, prev_text in enumerate(old_texts):
-            try:
-                distance_value = self.algo.func(new_text, prev_text)
-            except Exception as e:
-                print(
-                    f"Error calculating distance for pair ({prev_idx}, {current_idx}): {e}"
-                )
-                distance_value = float("nan")
-
-            self.data[(prev_idx, current_idx)] = distance_value
+        values = compute_distances(self.algo, new_text, old_texts, current_idx)
+        self.set_row(current_idx, values)
         elapsed_time = time.time() - start_time
         logging.debug(
             f"Algo {self.algo.name}. Computed distances to {current_idx} previous texts in {elapsed_time:.4f}s"
         )
 
+    def reserve(self, texts_count: int):
+        """
+        Prepare storage for `texts_count` texts. Keys are inserted in the
+        same order as add_dist would insert them, so rows may be filled in
+        any order afterwards.
+        """
+        for to_idx in range(texts_count):
+            for from_idx in range(to_idx):
+                self.data.setdefault((from_idx, to_idx), float("nan"))
+
+    def set_distance(self, from_idx: int, to_idx: int, value: float):
+        self.data[(from_idx, to_idx)] = value
+
+    def set_row(self, to_idx: int, values: np.ndarray, from_idx: int = 0):
+        """Set distances from texts from_idx, from_idx+1, ... to the text `to_idx`."""
+        for offset, value in enumerate(values.tolist()):
+            self.set_distance(from_idx + offset, to_idx, value)
+
     def max_key(self) -> int:
         return max(max(i, j) for i, j in self.data.keys())
 
@@ -77,12 +122,69 @@ class TextsDistances:
 
         return center_idx, min_max_distance, max_distances
 
-    def get_normalized_values(self) -> List[float]:
-        values = list(self.data.values())
+    def get_normalized_values(self) -> np.ndarray:
+        values = np.fromiter(self.data.values(), dtype=np.float64, count=len(self.data))
         if self.normalize:
-            return self.normalize(values)
+            return np.asarray(self.normalize(values), dtype=np.float64)
         return values
 
+    def pair_values(
+        self, from_indices: np.ndarray, to_indices: np.ndarray
+    ) -> np.ndarray:
+        """Distances of the pairs (from_indices[k], to_indices[k])."""
+        return np.array(
+            [
+                self.distance(int(from_idx), int(to_idx))
+                for from_idx, to_idx in zip(from_indices, to_indices)
+            ],
+            dtype=np.float64,
+        )
+
+    def pairs(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(from_indices, to_indices, raw values) of all present pairs."""
+        keys = np.array(list(self.data.keys()), dtype=np.int64).reshape(-1, 2)
+        values = np.fromiter(self.data.values(), dtype=np.float64, count=len(self.data))
+        return keys[:, 0], keys[:, 1], values
+
+    def iter_value_chunks(self) -> Iterator[np.ndarray]:
+        """Normalized values in chunks of at most chunk_size values."""
+        yield self.get_normalized_values()
+
+    def iter_values_for_indices(self, indices: np.ndarray) -> Iterator[np.ndarray]:
+        """values_for_indices(indices) in chunks of about chunk_size values."""
+        yield self.values_for_indices(indices)
+
+    def pairs_count(self) -> int:
+        return len(self.data)
+
+    def present_indices(self) -> np.ndarray:
+        """Sorted indices of texts that have at least one distance."""
+        return np.unique(np.fromiter((i for key in self.data for i in key), dtype=int))
+
+    def values_for_indices(self, indices: np.ndarray) -> np.ndarray:
+        """Raw distance values of all pairs between the given texts."""
+        keep = set(indices.tolist())
+        return np.fromiter(
+            (value for (i, j), value in self.data.items() if i in keep and j in keep),
+            dtype=np.float64,
+        )
+
+    def subset(self, keep: Union[np.ndarray, List[int]]) -> "TextsDistancesView":
+        """
+        Zero-copy view over the texts selected by a boolean keep-mask or an
+        index array. Behaves like copy() followed by remove_list() of all
+        other texts.
+        """
+        keep = np.asarray(keep)
+        if keep.dtype == bool:
+            keep = np.flatnonzero(keep)
+        indices = np.intersect1d(self.present_indices(), keep)
+        return TextsDistancesView(self, indices)
+
+    def without(self, text_ids: List[int]) -> "TextsDistancesView":
+        """Zero-copy view over all texts except `text_ids`."""
+        return self.subset(np.setdiff1d(self.present_indices(), text_ids))
+
     def copy(self):
         new_distances = TextsDistances(self.algo, self.normalize)
         new_distances.data = self.data.copy()
@@ -97,19 +199,140 @@ class TextsDistances:
 
         for key in keys_to_remove:
             self.data.pop(key, None)
+        self.removals += 1
+
+
+class TextsDistancesView(TextsDistances):
+    """Read-only subset of another TextsDistances. Nothing is copied."""
+
+    def __init__(self, parent: TextsDistances, indices: np.ndarray):
+        super().__init__(algo=parent.algo, normalize=parent.normalize)
+        self.parent = parent
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.chunk_size = parent.chunk_size
+
+    def set_distance(self, from_idx: int, to_idx: int, value: float):
+        raise TypeError("TextsDistancesView is read-only")
+
+    def contains(self, idx: int) -> bool:
+        pos = np.searchsorted(self.indices, idx)
+        return pos < len(self.indices) and self.indices[pos] == idx
+
+    def max_key(self) -> int:
+        if len(self.indices) < 2:
+            raise ValueError("max_key() of distances without pairs")
+        return int(self.indices[-1])
+
+    def distance(self, from_idx: int, to_idx: int) -> float:
+        if not self.contains(from_idx) or not self.contains(to_idx):
+            raise ValueError(f"Distance ({from_idx}, {to_idx}) does not exist")
+        return self.parent.distance(from_idx, to_idx)
+
+    def present_indices(self) -> np.ndarray:
+        return self.indices
+
+    def values_for_indices(self, indices: np.ndarray) -> np.ndarray:
+        return self.parent.values_for_indices(np.intersect1d(self.indices, indices))
+
+    def pair_values(
+        self, from_indices: np.ndarray, to_indices: np.ndarray
+    ) -> np.ndarray:
+        return self.parent.pair_values(from_indices, to_indices)
+
+    def pairs_count(self) -> int:
+        return len(self.indices) * (len(self.indices) - 1) // 2
+
+    def pairs(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        rows, cols = np.tril_indices(len(self.indices), -1)
+        from_indices, to_indices = self.indices[cols], self.indices[rows]
+        return from_indices, to_indices, self.pair_values(from_indices, to_indices)
+
+    def get_normalized_values(self) -> np.ndarray:
+        values = self.parent.values_for_indices(self.indices)
+        if self.normalize:
+            return np.asarray(self.normalize(values), dtype=np.float64)
+        return values
+
+    def iter_value_chunks(self) -> Iterator[np.ndarray]:
+        if self.normalize:
+            yield self.get_normalized_values()
+            return
+        yield from self.parent.iter_values_for_indices(self.indices)
+
+    def subset(self, keep: Union[np.ndarray, List[int]]) -> "TextsDistancesView":
+        view = super().subset(keep)
+        return TextsDistancesView(self.parent, view.indices)
+
+    def copy(self):
+        return TextsDistancesView(self.parent, self.indices.copy())
+
+    def remove_list(self, text_ids: List[int]):
+        self.indices = np.setdiff1d(self.indices, text_ids)
 
 
 def build_text_distances(
-    file_paths: List[str], algo: Algo
+    file_paths: List[str],
+    algo: Algo,
+    dense: bool = True,
+    executor: str = "serial",
+    max_workers: int = os.cpu_count(),
+    memmap_path: Optional[str] = None,
 ) -> Union[TextsDistances, List[str]]:
-    text_distances = TextsDistances(algo=algo, normalize=None)
     texts = []
     for file_path in file_paths:
         with open(file_path, "r", encoding="utf-8") as f:
-            new_text = f.read()
+            texts.append(f.read())
+
+    text_distances = build_distances_from_texts(
+        texts,
+        algo,
+        dense=dense,
+        executor=executor,
+        max_workers=max_workers,
+        memmap_path=memmap_path,
+    )
+    return text_distances, texts
 
-        text_distances.add_dist(texts, new_text)
 
-        texts.append(new_text)
+def build_distances_from_texts(
+    texts: List[str],
+    algo: Algo,
+    dense: bool = True,
+    executor: str = "serial",
+    max_workers: int = os.cpu_count(),
+    memmap_path: Optional[str] = None,
+) -> TextsDistances:
+    """build_text_distances for texts that are already loaded."""
+    if memmap_path is not None:
+        from texts_diversity.memmap_texts_distances import MemmapTextsDistances
 
-    return text_distances, texts
+        text_distances = MemmapTextsDistances(
+            algo=algo, path=memmap_path, capacity=len(texts)
+        )
+    elif dense:
+        # Imported here to avoid a circular import
+        from texts_diversity.condensed_texts_distances import (
+            CondensedTextsDistances,
+        )
+
+        text_distances = CondensedTextsDistances(
+            algo=algo, normalize=None, capacity=len(texts)
+        )
+    else:
+        text_distances = TextsDistances(algo=algo, normalize=None)
+
+    if executor != "serial":
+        from texts_diversity.parallel_distances import fill_distances_parallel
+
+        fill_distances_parallel(
+            text_distances, texts, executor=executor, max_workers=max_workers
+        )
+    else:
+        for current_idx, new_text in enumerate(texts):
+            text_distances.add_dist(texts[:current_idx], new_text)
+    clear_algo_cache(algo)
+
+    if memmap_path is not None:
+        text_distances.flush()
+
+    return text_distances
@@ -2,13 +2,13 @@ import argparse
 import time
 from typing import List
 
-from textdistance import LZMANCD
 import matplotlib.pyplot as plt
 
 from texts_diversity.files_list import FilesList
 from texts_diversity.algo import Algo
+from texts_diversity.cached_ncd import CachedLZMANCD
 from utils import cis_same_metric
-from src.metrics.poisson_dist_metric import poisson_dist_metric
+from src.metrics.poisson_dist_metric import fast_poisson_dist_metric
 from src.sets_split.sets_split_mark import SetsSplitMark
 from texts_diversity.utils import save_plot_safely
 
@@ -37,7 +37,7 @@ def parse_args():
 
 
 def run_timing_experiment(dir_path: str, max_files_list: List[int], output_plot: str):
-    lzma_algo = Algo("LZMANCD", LZMANCD().distance, color="royalblue")
+    lzma_algo = Algo("LZMANCD", CachedLZMANCD().distance, color="royalblue")
 
     file_counts = []
     times = []
@@ -49,7 +49,7 @@ def run_timing_experiment(dir_path: str, max_files_list: List[int], output_plot:
 
         calc_infos = cis_same_metric(
             algos=[lzma_algo],
-            metric=poisson_dist_metric,
+            metric=fast_poisson_dist_metric,
         )
 
         old_texts = []
@@ -70,7 +70,7 @@ def run_timing_experiment(dir_path: str, max_files_list: List[int], output_plot:
             all_file_names=files_list.file_paths,
             split_by=max_files,
             algo=lzma_algo,
-            metric=poisson_dist_metric(),
+            metric=fast_poisson_dist_metric(),
         )
         files_to_remove = sets_split_mark.filter_files()
 